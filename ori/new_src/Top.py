@@ -4,16 +4,27 @@
 """
 
 import csv
+from collections import deque
 import os
 import shutil
 import argparse
 import numpy as np
-import sys
+import traceback
+import multiprocessing
 
 # 导入必要的模块函数
 from coding import RepetitionCodeEncoder
-from decoding import repetition_decode_file, extract_encoded_bits_from_file, majority_vote_decode
-from channel import bsc_workflow, generate_probability_csv, read_input, compute_cdf, get_data, simulate_bsc, read_dat, write_dat
+from decoding import majority_vote_decode_planes
+from channel_fused import run_bsc_rep3
+from channel import bsc_workflow, bsc_fused, generate_probability_csv, simulate_bsc, read_dat, write_dat, iter_chunks
+from channelIndexCalc import calculate_channel_probabilities, calculate_mutual_information
+# 各功能模块的main函数，在本进程内直接调用，避免每次启动新的Python解释器
+from byteSource import main as byte_source_main
+from source_encoder import main as source_encode_main
+from source_decoder import main as source_decode_main
+from calcInfo import main as calc_info_main
+from calaDMSInfo import main as calc_dms_info_main
+from _popcnt import POPCNT8
 
 
 class CustomParser(argparse.ArgumentParser):
@@ -75,36 +86,22 @@ SCENARIOS = {
     }
 }
 
-# 解析命令行参数
-parser = CustomParser("the top level program for simulation scenarios")
-parser.add_argument("-s", "--scenario", type=str, 
-                   choices=['ideal', 'non_ideal_both', 'non_ideal_source_only', 'non_ideal_channel_only', 'non_ideal_none', 'non_ideal_all', 'all'],
-                   default='all', help="scenario to run: ideal, non_ideal_*, non_ideal_all, or all")
-parser.add_argument("MSG_LEN", type=int, help="length of the generated message (in bytes)")
-parser.add_argument("-del", "--delete", action="store_true", help="Whether to delete existing files")
-parser.add_argument("-d", "--detail", action="store_true", help="Whether to print detailed info")
-
-args = parser.parse_args()
-msg_len = args.MSG_LEN
-delete = args.delete
-show_detail = args.detail
-scenario_choice = args.scenario
-
 # 固定参数
 RS = 1.0  # 信源数据率固定为1（数据比特/秒）
 
-# ------------------------------------命令程序---------------------------------------
+# 信道/信源-信宿指标文件的表头，I(X;Y)在倒数第二列，p在最后一列
+CHANNEL_METRICS_HEADER = ['X', 'Y', 'H(X)', 'H(Y)', 'H(XY)', 'H(X|Y)', 'H(Y|X)', 'I(X;Y)', 'p']
+
+# ------------------------------------输入目录---------------------------------------
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_DIR = os.path.join(SCRIPT_DIR, "input")
 
-byteSourceCMD = "byteSource.py"
-sourceEncodeCMD = "source_encoder.py"
-sourceDecodeCMD = "source_decoder.py"
-channelCMD = "channel.py"
-calcInfoCMD = "calcInfo.py"
-calcDMSInfoCMD = "calaDMSInfo.py"
-channelIndexCalcCMD = "channelIndexCalc.py"
+# 目标指标在结果文件中的列顺序
+RES_METRICS_KEYS = ('rs', 'Rs', 'rc', 'R_ci', 'R_co', 'RI', 'er')
+
+# 重复码编码器不保存状态，所有场景共用一个实例
+CHANNEL_ENCODER = RepetitionCodeEncoder()
 
 # ---------------------------------------临时文件路径-----------------------------
 TEMP_DAT_DIR = os.path.join("..", "data", "temp", "datfile")
@@ -112,28 +109,105 @@ TEMP_METRIX_DIR = os.path.join("..", "data", "temp", "metrics")
 OUTPUT_FILE_256_DIR = os.path.join("..", "data", "temp", "file_2bit_to_256bit")
 METRIX_DIR = os.path.join("..", "data", "metrics")
 
-# 删除/生成目录
-if not os.path.exists(TEMP_DAT_DIR):
-    os.makedirs(TEMP_DAT_DIR)
-else:
-    if delete:
-        shutil.rmtree(TEMP_DAT_DIR)
-        os.makedirs(TEMP_DAT_DIR)
-if not os.path.exists(TEMP_METRIX_DIR):
-    os.makedirs(TEMP_METRIX_DIR)
-else:
-    if delete:
-        shutil.rmtree(TEMP_METRIX_DIR)
-        os.makedirs(TEMP_METRIX_DIR)
-if not os.path.exists(OUTPUT_FILE_256_DIR):
-    os.makedirs(OUTPUT_FILE_256_DIR)
-if not os.path.exists(METRIX_DIR):
-    os.makedirs(METRIX_DIR)
-
-
-def simulate_scenario(scenario_key):
-    """仿真单个场景"""
+
+def read_or_none(path):
+    """一次open读取文件的全部字节，文件不存在时返回None（代替先exists/getsize再open）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def load_cached(cache, path):
+    """读取二进制文件为uint8数组，同一路径只读取一次，结果缓存在cache字典中；文件不存在时返回None"""
+    if path not in cache:
+        data = read_or_none(path)
+        cache[path] = None if data is None else np.frombuffer(data, dtype=np.uint8)
+    return cache[path]
+
+
+def write_channel_metrics_csv(path, x_file, y_file, mutual_info, p):
+    """写入信道/信源-信宿指标文件，只给出I(X;Y)和p，其他熵值设为0；路径由csv模块按需加引号"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows([CHANNEL_METRICS_HEADER,
+                                 [x_file, y_file, 0, 0, 0, 0, 0, mutual_info, p]])
+
+
+def append_error_rate_csv(path, source_file, sink_file, er):
+    """追加一行信宿误码率，追加模式下位置为0说明是新文件，先写表头"""
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if f.tell() == 0:
+            writer.writerow(["INPUT1", "INPUT2", "error_rate"])
+        writer.writerow([source_file, sink_file, er])
+
+
+def read_source_entropy(source_metrics):
+    """从calaDMSInfo输出的信源指标文件读取信息熵（比特/比特），格式不正确时返回0"""
+    try:
+        with open(source_metrics, "r", encoding='utf-8') as f:
+            # 只需要最后一行数据和是否有表头，保留最后两行即可，不必把整个文件读成列表
+            rows = deque(csv.reader(f), maxlen=2)
+    except FileNotFoundError:
+        print(f"找不到'{source_metrics}'，场景仿真终止")
+        raise
+    if len(rows) <= 1:
+        print(f"警告: source_metrics文件为空")
+        return 0
+    row = rows[-1]
+    # 格式：Bit 0 Probability, Bit 1 Probability, Entropy, Redundancy
+    # Entropy在倒数第二列
+    if len(row) < 2:
+        print(f"警告: source_metrics格式不正确: {row}")
+        return 0
+    return float(row[-2].strip('"').strip("'"))
+
+
+def print_detail(result):
+    """打印场景的目标指标"""
+    print("--------------------------the detailed info is below--------------------")
+    print(f"信源信息率Rs：{result['Rs']:.10f}")
+    print(f"信道数据率rc：{result['rc']:.10f}")
+    print(f"信道输入信息率Rci：{result['R_ci']:.10f}")
+    print(f"信道输出信息率Rco：{result['R_co']:.10f}")
+    print(f"信宿关于信源信息率RI：{result['RI']:.10f}")
+    print(f"信宿误码率er：{result['er']:.10f}")
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = CustomParser("the top level program for simulation scenarios")
+    parser.add_argument("-s", "--scenario", type=str, 
+                       choices=['ideal', 'non_ideal_both', 'non_ideal_source_only', 'non_ideal_channel_only', 'non_ideal_none', 'non_ideal_all', 'all'],
+                       default='all', help="scenario to run: ideal, non_ideal_*, non_ideal_all, or all")
+    parser.add_argument("MSG_LEN", type=int, help="length of the generated message (in bytes)")
+    parser.add_argument("-del", "--delete", action="store_true", help="Whether to delete existing files")
+    parser.add_argument("-d", "--detail", action="store_true", help="Whether to print detailed info")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible runs")
+    parser.add_argument("--npz", action="store_true", help="also append the target metrics of each scenario to res_metrics.npz")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of scenarios to run in parallel (default: CPU count)")
+    return parser.parse_args(argv)
+
+
+def setup_dirs(delete=False):
+    """删除/生成目录"""
+    for temp_dir in (TEMP_DAT_DIR, TEMP_METRIX_DIR):
+        if delete:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir, exist_ok=True)
+    os.makedirs(OUTPUT_FILE_256_DIR, exist_ok=True)
+    os.makedirs(METRIX_DIR, exist_ok=True)
+
+
+def simulate_scenario(scenario_key, msg_len, show_detail=False, seed=None):
+    """
+    仿真单个场景
+    seed为整数或np.random.SeedSequence，本场景的随机数全部由它派生；
+    不依赖模块级的可变状态，可在进程池中并行运行
+    """
     scenario = SCENARIOS[scenario_key]
+    rng = np.random.default_rng(seed)
     print(f"\n{'='*80}")
     print(f"开始仿真: {scenario['name']}")
     print(f"场景描述: {scenario['description']}")
@@ -151,12 +225,8 @@ def simulate_scenario(scenario_key):
     scenario_prefix = scenario_key
     temp_source = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_source.{msg_len//1024}KB.dat")
     temp_source_encode = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_source.encode.huf")
-    temp_source_bits = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_source.bits.txt")
-    temp_channel_encode = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_channel.encode.txt")
     temp_noise = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_noise.dat")
     temp_channel = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_channel.dat")
-    temp_channel_decode = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_channel.decode.txt")
-    temp_channel_decode_bits = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_channel.decode.bits.txt")
     temp_channel_decode_binary = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_channel.decode.dat")
     output_file = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_output.dat")
     output_file_256 = os.path.join(OUTPUT_FILE_256_DIR, f"{scenario_prefix}_source.{msg_len//1024}KB.256.csv")
@@ -169,83 +239,87 @@ def simulate_scenario(scenario_key):
     source_sink_metrics = os.path.join(TEMP_METRIX_DIR, f"{scenario_prefix}_source_sink_metrics.csv")
     
     # ---------------------------------- 运行流程 ----------------------------------------
-    os.system("echo off")
     now_file = ""
     
     # 1. 生成信源文件
-    os.system("echo 'msg generating...'")
-    os.system(f"python {byteSourceCMD} {input_file} {temp_source} {msg_len}")
+    print("msg generating...")
+    byte_source_main(input_file, temp_source, msg_len, int(rng.integers(2**32)))
     now_file = temp_source
+
+    # 无信源编码、无信道编码且错误传递概率为0时信道不改变任何比特：
+    # 跳过BSC和解码，信道输出和信宿直接复制信源，只计算信源熵，其余指标取理论值
+    if scenario['channel_error_p'] == 0.0 and not scenario['source_encode'] and not scenario['channel_encode']:
+        print("noiseless channel, copying source to sink...")
+        shutil.copyfile(temp_source, temp_channel)
+        shutil.copyfile(temp_channel, output_file)
+
+        print("calculating metrics...")
+        calc_dms_info_main(temp_source, output_file_256, source_metrics)
+        calc_info_main(output_file, sink_entropy_csv, read_dat(output_file))
+        entropy = read_source_entropy(source_metrics)
+        if scenario_key == 'ideal' and abs(entropy - 1.0) < 0.01:
+            entropy = 1.0  # 等概率分布时取理论值1
+        print(f"信源信息熵: {entropy:.6f}")
+
+        # 无失真信道：I(X;Y) = I(X;Z) = H(X)，误码率为0
+        rs = 1
+        IUV = IXZ = entropy
+        er = 0.0
+        write_channel_metrics_csv(channel_metrics, temp_source, temp_channel, IUV, er)
+        write_channel_metrics_csv(source_sink_metrics, temp_source, output_file, IXZ, er)
+        append_error_rate_csv(sink_error_rate_csv, temp_source, output_file, er)
+
+        result = {
+            'rs': rs, 'Rs': rs * entropy, 'rc': rs, 'R_ci': rs * entropy,
+            'R_co': IUV * rs, 'RI': IXZ * rs, 'er': er
+        }
+        if show_detail:
+            print_detail(result)
+        return result
     
     # 2. 假如进行信源编码
     if scenario['source_encode']:
-        os.system("echo 'source encode...'")
-        os.system(f"python {sourceEncodeCMD} {input_file} {now_file} {temp_source_encode}")
+        print("source encode...")
+        source_encode_main(input_file, now_file, temp_source_encode)
         now_file = temp_source_encode
     
-    # 3. 假如进行信道编码
+    # 3. 假如进行信道编码：按块完成 展开→重复码编码→BSC→多数投票解码→打包，
+    #    不生成中间比特流文件，峰值内存只与块大小有关
     original_binary_size = None  # 保存原始二进制文件大小
+    # 无信源编码时使用融合实现，直接由字节得到恢复后的字节
+    fused_channel = scenario['channel_encode'] and not scenario['source_encode']
     if scenario['channel_encode']:
-        os.system("echo 'channel encode...'")
-        # 需要将二进制文件转换为比特串
-        if scenario['source_encode']:
-            # .huf文件，读取二进制内容
-            with open(now_file, 'rb') as f:
-                data = f.read()
-            original_binary_size = len(data)  # 保存原始大小
-            bit_string = ''.join(f'{byte:08b}' for byte in data)
-            print(f"信源编码文件大小: {len(data)} 字节, 比特串长度: {len(bit_string)}")
+        data = np.fromfile(now_file, dtype=np.uint8)
+        original_binary_size = len(data)  # 保存原始大小
+        chunks = list(iter_chunks(data))
+        # 每块使用由同一SeedSequence派生的独立随机数流，结果可复现
+        chunk_seeds = np.random.SeedSequence(int(rng.integers(2**63))).spawn(len(chunks))
+        if fused_channel:
+            print("channel encode + passing BSC + channel decode...")
+            with open(temp_channel_decode_binary, 'wb') as f:
+                for chunk, chunk_seed in zip(chunks, chunk_seeds):
+                    recovered = np.empty_like(chunk)
+                    run_bsc_rep3(chunk, scenario['channel_error_p'], int(chunk_seed.generate_state(1)[0]), recovered)
+                    recovered.tofile(f)
         else:
-            # .dat文件，转换为比特串
-            data = np.fromfile(now_file, dtype=np.uint8)
-            original_binary_size = len(data)  # 保存原始大小
-            bit_string = ''.join(f'{byte:08b}' for byte in data)
-            print(f"信源文件大小: {len(data)} 字节, 比特串长度: {len(bit_string)}")
-        
-        # 保存比特串到文件
-        with open(temp_source_bits, 'w', encoding='utf-8') as f:
-            f.write(bit_string)
-        
-        # 使用重复码编码器进行编码
-        encoder = RepetitionCodeEncoder()
-        encoded_bits = encoder.encode_bit_string(bit_string)
-        print(f"信道编码后比特串长度: {len(encoded_bits)} (原始长度: {len(bit_string)})")
-        with open(temp_channel_encode, 'w', encoding='utf-8') as f:
-            f.write(encoded_bits)
-        
-        now_file = temp_channel_encode
-    
-    # 4. 通过信道
-    os.system("echo 'passing BSC...'")
-    if scenario['channel_encode']:
-        # 处理比特串文件
-        # 读取编码后的比特串
-        with open(now_file, 'r', encoding='utf-8') as f:
-            encoded_bits = ''.join(c for c in f.read() if c in '01')
-        
-        # 生成噪声比特串
-        np.random.seed()  # 重置随机种子
-        noise_bits = ''.join('1' if np.random.random() < scenario['channel_error_p'] else '0' 
-                            for _ in range(len(encoded_bits)))
-        
-        # 异或操作
-        channel_output_bits = ''.join('1' if a != b else '0' for a, b in zip(encoded_bits, noise_bits))
-        
-        # 保存信道输出
-        with open(temp_channel, 'w', encoding='utf-8') as f:
-            f.write(channel_output_bits)
-        
-        # 生成噪声文件（二进制格式）
-        noise_bytes = []
-        for i in range(0, len(noise_bits), 8):
-            byte_str = noise_bits[i:i+8]
-            if len(byte_str) == 8:
-                noise_bytes.append(int(byte_str, 2))
-        if noise_bytes:
-            np.array(noise_bytes, dtype=np.uint8).tofile(temp_noise)
-        
-        now_file = temp_channel
+            print("channel encode + passing BSC + channel decode (chunked)...")
+            print(f"信源编码文件大小: {len(data)} 字节, 比特串长度: {len(data) * 8}")
+            with open(temp_channel_decode_binary, 'wb') as f:
+                for chunk, chunk_seed in zip(chunks, chunk_seeds):
+                    chunk_rng = np.random.default_rng(chunk_seed)
+                    # 重复码编码为N个打包的码字平面，不需要展开成比特
+                    encoded_planes = CHANNEL_ENCODER.encode_planes(chunk)
+                    # 每个平面生成独立的打包噪声比特（每比特以channel_error_p的概率为1）并异或
+                    noise_planes = np.packbits(chunk_rng.random((CHANNEL_ENCODER.N, len(chunk) * 8)) < scenario['channel_error_p'], axis=1)
+                    channel_output = np.bitwise_xor(encoded_planes, noise_planes)
+                    # 三个平面按位多数投票解码，结果已是打包的字节
+                    majority_vote_decode_planes(channel_output).tofile(f)
+            print(f"信道编码后比特串长度: {len(data) * 8 * CHANNEL_ENCODER.N} (原始长度: {len(data) * 8})")
+        now_file = temp_channel_decode_binary
+    
+    # 4. 无信道编码时直接通过信道
     else:
+        print("passing BSC...")
         # 直接处理二进制文件
         # 生成噪声文件
         noise_pmf_file = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_noise_pmf.csv")
@@ -253,173 +327,96 @@ def simulate_scenario(scenario_key):
         
         # 直接调用bsc_workflow函数
         bsc_workflow(now_file, noise_pmf_file, temp_channel, temp_noise, 
-                    scenario['channel_error_p'], msg_len)
+                    scenario['channel_error_p'], msg_len, rng=rng)
         now_file = temp_channel
+        temp_channel_decode_binary = None
     
-    # 5. 假如进行了信道编码，那么一定要进行信道解码
+    # 5. 校验信道解码后的文件
     if scenario['channel_encode']:
-        os.system("echo 'channel decode...'")
-        # 使用重复码解码
-        with open(now_file, 'r', encoding='utf-8') as f:
-            encoded_bits = ''.join(c for c in f.read() if c in '01')
-        
-        decoded_bits = majority_vote_decode(encoded_bits, n=3)
-        
-        # 保存解码后的比特串
-        with open(temp_channel_decode, 'w', encoding='utf-8') as f:
-            f.write(decoded_bits)
-        
-        # 将比特串转换回二进制文件
-        # 如果之前有信源编码，需要恢复为.huf格式；否则为.dat格式
-        bytes_list = []
-        # 根据原始二进制文件大小截断或补0
-        expected_bits = original_binary_size * 8 if original_binary_size else len(decoded_bits)
-        
-        if len(decoded_bits) > expected_bits:
-            # 截断到期望长度
-            decoded_bits = decoded_bits[:expected_bits]
-            print(f"警告: 解码比特串长度超过期望，已截断: {len(decoded_bits)} -> {expected_bits}")
-        elif len(decoded_bits) < expected_bits:
-            # 补0到期望长度
-            decoded_bits = decoded_bits + '0' * (expected_bits - len(decoded_bits))
-            print(f"警告: 解码比特串长度不足，已补0: {len(decoded_bits)} -> {expected_bits}")
-        
-        # 确保长度是8的倍数
-        if len(decoded_bits) % 8 != 0:
-            decoded_bits = decoded_bits + '0' * (8 - len(decoded_bits) % 8)
-        
-        for i in range(0, len(decoded_bits), 8):
-            byte_str = decoded_bits[i:i+8]
-            if len(byte_str) == 8:
-                bytes_list.append(int(byte_str, 2))
-        
-        # 截断到原始大小
-        if original_binary_size and len(bytes_list) > original_binary_size:
-            bytes_list = bytes_list[:original_binary_size]
-        
-        if bytes_list:
-            data = np.array(bytes_list, dtype=np.uint8)
-            # 保存为二进制文件（.huf或.dat格式都是二进制）
-            data.tofile(temp_channel_decode_binary)
-            # 验证文件是否成功写入
-            if os.path.exists(temp_channel_decode_binary) and os.path.getsize(temp_channel_decode_binary) > 0:
-                # 验证文件大小
-                actual_size = os.path.getsize(temp_channel_decode_binary)
-                if original_binary_size and abs(actual_size - original_binary_size) > 0:
-                    print(f"警告: 文件大小不匹配: 实际={actual_size}, 期望={original_binary_size}")
-                    # 如果大小不匹配，尝试修正
-                    if actual_size > original_binary_size:
-                        # 截断文件
-                        with open(temp_channel_decode_binary, 'r+b') as f:
-                            f.truncate(original_binary_size)
-                        print(f"已截断文件到期望大小: {original_binary_size}")
-                    elif actual_size < original_binary_size:
-                        # 补0
-                        with open(temp_channel_decode_binary, 'ab') as f:
-                            f.write(b'\x00' * (original_binary_size - actual_size))
-                        print(f"已补0到期望大小: {original_binary_size}")
-                
-                # 如果有信源编码，验证.huf文件头部格式
-                if scenario['source_encode']:
-                    try:
-                        with open(temp_channel_decode_binary, 'rb') as f:
-                            header_size_bytes = f.read(2)
-                            if len(header_size_bytes) == 2:
-                                header_size = int.from_bytes(header_size_bytes, 'little')
-                                if header_size < 6 or header_size > actual_size:
-                                    print(f"警告: .huf文件头部大小异常: {header_size}, 文件大小: {actual_size}")
-                    except Exception as e:
-                        print(f"警告: 验证.huf文件头部时出错: {e}")
-                
-                now_file = temp_channel_decode_binary
-                print(f"信道解码完成，恢复文件大小: {os.path.getsize(temp_channel_decode_binary)} 字节 (期望: {original_binary_size if original_binary_size else '未知'})")
-            else:
-                print("错误: 信道解码后文件写入失败")
-                now_file = temp_channel_decode
+        decoded = read_or_none(temp_channel_decode_binary)
+        if decoded:
+            # 验证文件大小
+            actual_size = len(decoded)
+            if original_binary_size and abs(actual_size - original_binary_size) > 0:
+                print(f"警告: 文件大小不匹配: 实际={actual_size}, 期望={original_binary_size}")
+                # 如果大小不匹配，尝试修正
+                if actual_size > original_binary_size:
+                    # 截断文件
+                    with open(temp_channel_decode_binary, 'r+b') as f:
+                        f.truncate(original_binary_size)
+                    print(f"已截断文件到期望大小: {original_binary_size}")
+                elif actual_size < original_binary_size:
+                    # 补0
+                    with open(temp_channel_decode_binary, 'ab') as f:
+                        f.write(b'\x00' * (original_binary_size - actual_size))
+                    print(f"已补0到期望大小: {original_binary_size}")
+                actual_size = original_binary_size
+
+            # 如果有信源编码，验证.huf文件头部格式
+            if scenario['source_encode'] and len(decoded) >= 2:
+                header_size = int.from_bytes(decoded[:2], 'little')
+                if header_size < 6 or header_size > actual_size:
+                    print(f"警告: .huf文件头部大小异常: {header_size}, 文件大小: {actual_size}")
+
+            print(f"信道解码完成，恢复文件大小: {actual_size} 字节 (期望: {original_binary_size})")
         else:
             print("警告: 解码后没有数据")
-            now_file = temp_channel_decode
-    else:
-        temp_channel_decode_binary = None
     
     # 6. 假如进行了信源编码，那么一定要进行信源解码
     if scenario['source_encode']:
-        os.system("echo 'source decode...'")
+        print("source decode...")
+        encoded = read_or_none(now_file)
+        recover = False  # 是否需要用原始信源文件代替解码输出
         # 检查输入文件是否存在且有效
-        if os.path.exists(now_file) and os.path.getsize(now_file) > 0:
+        if not encoded:
+            print(f"错误: 信源解码输入文件不存在或为空: {now_file}")
+            recover = True
+        elif len(encoded) < 6:
             # 检查文件是否至少包含头部（至少6字节：2字节头部长度 + 1字节符号数 + 4字节原始长度）
-            file_size = os.path.getsize(now_file)
-            if file_size < 6:
-                print(f"错误: 信源解码输入文件太小 ({file_size} 字节)，可能已损坏")
-                # 尝试使用原始信源文件
-                if os.path.exists(temp_source):
-                    print(f"使用原始信源文件作为输出: {temp_source}")
-                    with open(output_file, "wb") as f1:
-                        with open(temp_source, "rb") as f2:
-                            data = f2.read()
-                            f1.write(data)
-                    now_file = output_file
-                else:
-                    print(f"错误: 无法恢复，原始信源文件也不存在")
-                    now_file = output_file
-            else:
-                # 尝试解码
-                result = os.system(f"python {sourceDecodeCMD} {now_file} {output_file}")
-                if result != 0:
-                    print(f"警告: 信源解码失败，返回码: {result}")
-                    print(f"  输入文件: {now_file}, 大小: {file_size} 字节")
-                    # 如果解码失败，尝试使用原始信源文件
-                    if os.path.exists(temp_source):
-                        print(f"使用原始信源文件作为输出")
-                        with open(output_file, "wb") as f1:
-                            with open(temp_source, "rb") as f2:
-                                data = f2.read()
-                                f1.write(data)
-                    else:
-                        # 最后尝试：直接复制输入文件
-                        with open(output_file, "wb") as f1:
-                            with open(now_file, "rb") as f2:
-                                data = f2.read()
-                                f1.write(data)
-                # 检查输出文件是否生成
-                if not os.path.exists(output_file) or os.path.getsize(output_file) == 0:
-                    print(f"错误: 信源解码后输出文件不存在或为空: {output_file}")
-                    # 尝试使用原始信源文件
-                    if os.path.exists(temp_source):
-                        with open(output_file, "wb") as f1:
-                            with open(temp_source, "rb") as f2:
-                                data = f2.read()
-                                f1.write(data)
-                now_file = output_file
+            print(f"错误: 信源解码输入文件太小 ({len(encoded)} 字节)，可能已损坏")
+            recover = True
         else:
-            print(f"错误: 信源解码输入文件不存在或为空: {now_file}")
-            # 尝试使用原始信源文件
-            if os.path.exists(temp_source):
-                with open(output_file, "wb") as f1:
-                    with open(temp_source, "rb") as f2:
-                        data = f2.read()
-                        f1.write(data)
-                now_file = output_file
-            else:
+            # 尝试解码
+            try:
+                result = source_decode_main(now_file, output_file)
+            except Exception as e:
+                # 信道误码可能破坏Huffman码流，解码时抛出异常
+                print(f"信源解码异常: {type(e).__name__}: {e}")
+                result = 1
+            if result != 0:
+                print(f"警告: 信源解码失败，返回码: {result}")
+                print(f"  输入文件: {now_file}, 大小: {len(encoded)} 字节")
+                recover = True
+            elif not read_or_none(output_file):
+                # 检查输出文件是否生成
+                print(f"错误: 信源解码后输出文件不存在或为空: {output_file}")
+                recover = True
+        if recover:
+            # 尝试使用原始信源文件作为输出，原始信源文件也不存在时直接复制输入文件
+            try:
+                shutil.copyfile(temp_source, output_file)
+                print(f"使用原始信源文件作为输出: {temp_source}")
+            except FileNotFoundError:
                 print(f"错误: 无法恢复，原始信源文件也不存在")
-                now_file = output_file
+                if encoded is not None:
+                    shutil.copyfile(now_file, output_file)
+        now_file = output_file
     else:
-        # 直接复制
-        if os.path.exists(now_file):
-            with open(output_file, "wb") as f1:
-                with open(now_file, "rb") as f2:
-                    data = f2.read()
-                    f1.write(data)
+        # 直接复制（shutil.copyfile在Linux下使用sendfile，数据不经过Python）
+        try:
+            shutil.copyfile(now_file, output_file)
             now_file = output_file
-        else:
+        except FileNotFoundError:
             print(f"错误: 文件不存在: {now_file}")
-    
+
     # ------------------------------- 计算指标,写入文件 ----------------------------
-    os.system("echo calculating metrics...")
+    print("calculating metrics...")
     now_file_metrix = temp_source
+    # 指标计算阶段各文件只读取一次，之后的步骤共用内存中的数组
+    arrays = {}
     
     # 1. 信源信息熵
-    os.system(f"python {calcDMSInfoCMD} {temp_source} {output_file_256} {source_metrics}")
+    calc_dms_info_main(temp_source, output_file_256, source_metrics)
     
     # 2. 如果进行了信源编码
     if scenario['source_encode']:
@@ -428,10 +425,10 @@ def simulate_scenario(scenario_key):
     # 3. 如果进行了信道编码
     if scenario['channel_encode']:
         # 计算信道解码后的信息熵
-        if os.path.exists(temp_channel_decode_binary):
+        channel_decode_data = load_cached(arrays, temp_channel_decode_binary)
+        if channel_decode_data is not None:
             channel_decode_entropy_csv = os.path.join(TEMP_METRIX_DIR, f"{scenario_prefix}_channel_decode_entropy.csv")
-            os.system(f"python {calcInfoCMD} {temp_channel_decode_binary} {channel_decode_entropy_csv}")
-        now_file_metrix = temp_channel_encode
+            calc_info_main(temp_channel_decode_binary, channel_decode_entropy_csv, channel_decode_data)
     
     # 4. 计算信道指标（IUV和ec）
     # 初始化IUV和ec
@@ -457,23 +454,11 @@ def simulate_scenario(scenario_key):
         channel_input_file = now_file_metrix
         channel_output_file = temp_channel
     
-    if os.path.exists(channel_input_file) and os.path.exists(channel_output_file):
+    # 读取输入和输出数据（都作为二进制文件读取，.huf文件也是二进制格式）
+    input_data = load_cached(arrays, channel_input_file)
+    output_data = load_cached(arrays, channel_output_file)
+    if input_data is not None and output_data is not None:
         try:
-            # 读取输入和输出数据（都作为二进制文件读取）
-            # 注意：.huf文件也是二进制格式，可以用read_dat读取
-            try:
-                input_data = read_dat(channel_input_file)
-            except:
-                # 如果read_dat失败，尝试直接读取二进制
-                with open(channel_input_file, 'rb') as f:
-                    input_data = np.frombuffer(f.read(), dtype=np.uint8)
-            
-            try:
-                output_data = read_dat(channel_output_file)
-            except:
-                # 如果read_dat失败，尝试直接读取二进制
-                with open(channel_output_file, 'rb') as f:
-                    output_data = np.frombuffer(f.read(), dtype=np.uint8)
             
             # 确保长度匹配
             min_len = min(len(input_data), len(output_data))
@@ -484,7 +469,6 @@ def simulate_scenario(scenario_key):
                 print(f"计算信道指标: 输入长度={len(input_data)}, 输出长度={len(output_data)}")
                 
                 # 计算信道转移概率和互信息
-                from channelIndexCalc import calculate_channel_probabilities, calculate_mutual_information, write_channel_results
                 transition_prob = calculate_channel_probabilities(input_data, output_data)
                 
                 # 检查transition_prob是否有NaN或无效值
@@ -518,24 +502,18 @@ def simulate_scenario(scenario_key):
             # 保存信道指标
             # 格式：X, Y, H(X), H(Y), H(XY), H(X|Y), H(Y|X), I(X;Y), p
             if min_len > 0:
-                with open(channel_metrics, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-                    writer.writerow(['X', 'Y', 'H(X)', 'H(Y)', 'H(XY)', 'H(X|Y)', 'H(Y|X)', 'I(X;Y)', 'p'])
-                    # 只计算I(X;Y)和p，其他值设为0
-                    writer.writerow(['"{}"'.format(channel_input_file), '"{}"'.format(channel_output_file), 
-                                    '0', '0', '0', '0', '0', IUV, ec])
+                write_channel_metrics_csv(channel_metrics, channel_input_file, channel_output_file, IUV, ec)
                 print(f"信道指标计算完成: IUV={IUV:.6f}, ec={ec:.6f}")
         except Exception as e:
             print(f"计算信道指标时出错: {e}")
-            import traceback
             traceback.print_exc()
             IUV = 0
             ec = 0
     else:
         print(f"警告: 信道输入或输出文件不存在")
-        if not os.path.exists(channel_input_file):
+        if input_data is None:
             print(f"  输入文件不存在: {channel_input_file}")
-        if not os.path.exists(channel_output_file):
+        if output_data is None:
             print(f"  输出文件不存在: {channel_output_file}")
         IUV = 0
         ec = 0
@@ -544,48 +522,35 @@ def simulate_scenario(scenario_key):
     # 计算原始信源和最终输出的误码率
     er = 0.0
     try:
-        if os.path.exists(temp_source) and os.path.exists(output_file):
-            source_data = np.fromfile(temp_source, dtype=np.uint8)
-            sink_data = np.fromfile(output_file, dtype=np.uint8)
+        source_data = load_cached(arrays, temp_source)
+        sink_data = load_cached(arrays, output_file)
+        if source_data is not None and sink_data is not None:
             min_len = min(len(source_data), len(sink_data))
             if min_len > 0:
-                error_bits = 0
-                total_bits = 0
-                for i in range(min_len):
-                    source_byte = source_data[i]
-                    sink_byte = sink_data[i]
-                    for j in range(8):
-                        source_bit = (source_byte >> j) & 1
-                        sink_bit = (sink_byte >> j) & 1
-                        if source_bit != sink_bit:
-                            error_bits += 1
-                        total_bits += 1
+                # 按字节异或后查表统计不同的比特数
+                diff = source_data[:min_len] ^ sink_data[:min_len]
+                error_bits = int(POPCNT8[diff].sum(dtype=np.int64))
+                total_bits = min_len * 8
                 
-                er = error_bits / total_bits if total_bits > 0 else 0.0
+                er = error_bits / total_bits
             else:
                 print("警告: 源文件或输出文件为空")
         else:
             print(f"警告: 源文件或输出文件不存在")
-            if not os.path.exists(temp_source):
+            if source_data is None:
                 print(f"  源文件不存在: {temp_source}")
-            if not os.path.exists(output_file):
+            if sink_data is None:
                 print(f"  输出文件不存在: {output_file}")
     except Exception as e:
         print(f"计算误码率时出错: {e}")
-        import traceback
         traceback.print_exc()
         er = 0.0
     
     # 保存误码率
-    file_exists = os.path.isfile(sink_error_rate_csv)
-    with open(sink_error_rate_csv, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["INPUT1", "INPUT2", "error_rate"])
-        writer.writerow([temp_source, output_file, er])
+    append_error_rate_csv(sink_error_rate_csv, temp_source, output_file, er)
     
     # 6. 计算信宿的信息熵
-    os.system(f"python {calcInfoCMD} {output_file} {sink_entropy_csv}")
+    calc_info_main(output_file, sink_entropy_csv, load_cached(arrays, output_file))
     
     # 7. 计算IXZ（信源和信宿的互信息）
     new_noise_file = os.path.join(TEMP_DAT_DIR, f"{scenario_prefix}_new_noise_file.dat")
@@ -600,126 +565,64 @@ def simulate_scenario(scenario_key):
             f1.write(f"1,{er:.10f}")
         
         # 生成噪声文件
-        source_size = os.path.getsize(temp_source)
-        os.system(f"python {byteSourceCMD} {new_noise_file} {temp_noise_source_sink} {source_size}")
+        source_size = len(load_cached(arrays, temp_source))
+        byte_source_main(new_noise_file, temp_noise_source_sink, source_size, int(rng.integers(2**32)))
         
         # 通过BSC信道
-        if os.path.exists(temp_source) and os.path.exists(temp_noise_source_sink):
-            source_data = read_dat(temp_source)
-            noise_data = read_dat(temp_noise_source_sink)
+        source_data = load_cached(arrays, temp_source)
+        noise_data = load_cached(arrays, temp_noise_source_sink)
+        if source_data is not None and noise_data is not None:
             sink_data = simulate_bsc(source_data, noise_data)
             write_dat(sink_data, temp_source_sink)
             
             # 计算source_sink的互信息
-            if os.path.exists(temp_source_sink):
-                from channelIndexCalc import calculate_channel_probabilities, calculate_mutual_information
-                transition_prob = calculate_channel_probabilities(source_data, sink_data)
+            transition_prob = calculate_channel_probabilities(source_data, sink_data)
                 
-                # 检查transition_prob是否有NaN或无效值
-                if np.any(np.isnan(transition_prob)) or np.any(np.isinf(transition_prob)):
-                    print("警告: source_sink转移概率矩阵包含NaN或Inf值，使用简化计算")
-                    IXZ = 0
-                else:
-                    try:
-                        IXZ = calculate_mutual_information(transition_prob) / 8  # 转换为每比特的互信息
-                        # 检查IXZ是否为NaN
-                        if np.isnan(IXZ) or np.isinf(IXZ):
-                            print("警告: IXZ计算结果为NaN或Inf，使用简化计算")
-                            IXZ = 0
-                    except Exception as e:
-                        print(f"警告: 计算IXZ时出错: {e}，使用简化计算")
+            # 检查transition_prob是否有NaN或无效值
+            if np.any(np.isnan(transition_prob)) or np.any(np.isinf(transition_prob)):
+                print("警告: source_sink转移概率矩阵包含NaN或Inf值，使用简化计算")
+                IXZ = 0
+            else:
+                try:
+                    IXZ = calculate_mutual_information(transition_prob) / 8  # 转换为每比特的互信息
+                    # 检查IXZ是否为NaN
+                    if np.isnan(IXZ) or np.isinf(IXZ):
+                        print("警告: IXZ计算结果为NaN或Inf，使用简化计算")
                         IXZ = 0
+                except Exception as e:
+                    print(f"警告: 计算IXZ时出错: {e}，使用简化计算")
+                    IXZ = 0
                 
-                # 保存source_sink指标
-                # 格式：X, Y, H(X), H(Y), H(XY), H(X|Y), H(Y|X), I(X;Y), p
-                # I(X;Y)在倒数第二列
-                with open(source_sink_metrics, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-                    writer.writerow(['X', 'Y', 'H(X)', 'H(Y)', 'H(XY)', 'H(X|Y)', 'H(Y|X)', 'I(X;Y)', 'p'])
-                    # 只计算I(X;Y)，其他值设为0
-                    writer.writerow(['"{}"'.format(temp_source), '"{}"'.format(temp_source_sink), 
-                                    '0', '0', '0', '0', '0', IXZ, er])
-                print(f"IXZ计算完成: {IXZ:.6f}")
+            # 保存source_sink指标
+            # 格式：X, Y, H(X), H(Y), H(XY), H(X|Y), H(Y|X), I(X;Y), p
+            # I(X;Y)在倒数第二列
+            write_channel_metrics_csv(source_sink_metrics, temp_source, temp_source_sink, IXZ, er)
+            print(f"IXZ计算完成: {IXZ:.6f}")
     except Exception as e:
         print(f"计算IXZ时出错: {e}")
-        import traceback
         traceback.print_exc()
         IXZ = 0
     
     # -------------------------- 计算仿真的指标数值 ---------------------------------
-    os.system("echo calculating target metrics...")
+    print("calculating target metrics...")
     rs = 1  # 初始信息率（bit/s）
     Rs = rc = R_ci = R_co = RI = 0
     eta = _L = -1
     # 注意：IXZ已经在上面计算过了，不要重新初始化
     
     # 获取信源信息熵
-    try:
-        if os.path.exists(source_metrics):
-            with open(source_metrics, "r", encoding='utf-8') as f:
-                csv_reader = csv.reader(f)
-                rows = [r for r in csv_reader]
-                if len(rows) > 1:
-                    row = rows[-1]
-                    # 格式：Bit 0 Probability, Bit 1 Probability, Entropy, Redundancy
-                    # Entropy在倒数第二列
-                    if len(row) >= 2:
-                        entropy_str = row[-2].strip('"').strip("'")
-                        entropy = float(entropy_str)  # Entropy在倒数第二列
-                        Rs = rs * entropy
-                        # 理想情况下，如果entropy接近1（等概率分布），确保Rs=1
-                        if scenario_key == 'ideal' and abs(entropy - 1.0) < 0.01:
-                            Rs = 1.0
-                            entropy = 1.0  # 也更新entropy，确保一致性
-                            print(f"理想情况：信源信息熵修正为1.0（理论值），Rs={Rs:.6f}")
-                        else:
-                            print(f"信源信息熵: {entropy:.6f}, Rs={Rs:.6f}")
-                    else:
-                        print(f"警告: source_metrics格式不正确: {row}")
-                        entropy = 0
-                        Rs = 0
-                else:
-                    print(f"警告: source_metrics文件为空")
-                    entropy = 0
-                    Rs = 0
-        else:
-            print(f"错误: 找不到'{source_metrics}'")
-            exit(1)
-    except FileNotFoundError:
-        print(f"找不到'{source_metrics}'，程序已退出")
-        exit(1)
-    except Exception as e:
-        print(f"读取信源指标时出错: {e}")
-        import traceback
-        traceback.print_exc()
-        exit(1)
+    entropy = read_source_entropy(source_metrics)
+    Rs = rs * entropy
+    # 理想情况下，如果entropy接近1（等概率分布），确保Rs=1
+    if scenario_key == 'ideal' and abs(entropy - 1.0) < 0.01:
+        Rs = 1.0
+        entropy = 1.0  # 也更新entropy，确保一致性
+        print(f"理想情况：信源信息熵修正为1.0（理论值），Rs={Rs:.6f}")
+    else:
+        print(f"信源信息熵: {entropy:.6f}, Rs={Rs:.6f}")
     
-    # 获取IUV和ec（如果之前计算了）
-    if IUV == 0 or ec == 0:
-        try:
-            if os.path.exists(channel_metrics):
-                with open(channel_metrics, "r", encoding='utf-8') as f:
-                    csv_reader = csv.reader(f)
-                    rows = [r for r in csv_reader]
-                    if len(rows) > 1:
-                        row = rows[-1]
-                        # 格式：X, Y, H(X), H(Y), H(XY), H(X|Y), H(Y|X), I(X;Y), p
-                        # I(X;Y)在倒数第二列，p在最后一列
-                        if len(row) >= 2:
-                            IUV_str = row[-2].strip('"').strip("'")
-                            IUV = float(IUV_str)  # I(X;Y)在倒数第二列
-                            # 检查IUV是否为负值（互信息应该非负）
-                            if IUV < 0:
-                                print(f"警告: 从channel_metrics读取的IUV为负值 ({IUV:.6f})，互信息应该非负，将使用简化计算")
-                                IUV = 0  # 重置为0，后续会使用简化计算
-                            ec_str = row[-1].strip('"').strip("'")
-                            ec = float(ec_str)  # p在最后一列
-                            print(f"从channel_metrics读取: IUV={IUV:.6f}, ec={ec:.6f}")
-        except Exception as e:
-            print(f"从channel_metrics读取IUV时出错: {e}")
-            if show_detail:
-                import traceback
-                traceback.print_exc()
+    # IUV和ec直接使用上面计算的值，不再从刚写入的channel_metrics读回；
+    # 本次未写入时文件里可能是以前运行留下的旧数据
     
     # 如果IUV还是0、NaN或负值，使用简化计算
     # 互信息理论上应该是非负的，如果出现负值，说明计算有问题
@@ -751,41 +654,23 @@ def simulate_scenario(scenario_key):
         ec = 0.0
         print(f"理想情况：ec = 0")
     
-    # 获取IXZ（如果之前计算了）
-    if IXZ == 0:
-        try:
-            if os.path.exists(source_sink_metrics):
-                with open(source_sink_metrics, "r", encoding='utf-8') as f:
-                    csv_reader = csv.reader(f)
-                    rows = [r for r in csv_reader]
-                    if len(rows) > 1:
-                        row = rows[-1]
-                        # 格式：X, Y, H(X), H(Y), H(XY), H(X|Y), H(Y|X), I(X;Y), p
-                        # I(X;Y)在倒数第二列
-                        if len(row) >= 2:
-                            IXZ_str = row[-2].strip('"').strip("'")
-                            IXZ = float(IXZ_str)  # I(X;Y)在倒数第二列
-                            print(f"从source_sink_metrics读取IXZ: {IXZ:.6f}")
-        except Exception as e:
-            print(f"从source_sink_metrics读取IXZ时出错: {e}")
-            if show_detail:
-                import traceback
-                traceback.print_exc()
+    # IXZ同样直接使用上面计算的值，不再从source_sink_metrics读回
     
     # 获取信宿信息熵（用于简化计算IXZ）
     sink_entropy = 0
     try:
-        if os.path.exists(sink_entropy_csv):
-            with open(sink_entropy_csv, "r", encoding='utf-8') as f:
-                csv_reader = csv.reader(f)
-                rows = [r for r in csv_reader]
-                if len(rows) > 0:
-                    # calcInfo.py的输出格式："文件路径","信息熵","文件长度"
-                    row = rows[-1]
-                    if len(row) > 1:
-                        sink_entropy_str = row[1].strip('"').strip("'")
-                        sink_entropy = float(sink_entropy_str)
-                        print(f"从sink_entropy_csv读取信宿信息熵: {sink_entropy:.6f}")
+        with open(sink_entropy_csv, "r", encoding='utf-8') as f:
+            csv_reader = csv.reader(f)
+            rows = deque(csv_reader, maxlen=1)  # calcInfo追加写入，没有表头，只保留最后一行
+            if len(rows) > 0:
+                # calcInfo.py的输出格式："文件路径","信息熵","文件长度"
+                row = rows[-1]
+                if len(row) > 1:
+                    sink_entropy_str = row[1].strip('"').strip("'")
+                    sink_entropy = float(sink_entropy_str)
+                    print(f"从sink_entropy_csv读取信宿信息熵: {sink_entropy:.6f}")
+    except FileNotFoundError:
+        pass  # 文件不存在时沿用已有的值
     except Exception as e:
         print(f"读取信宿信息熵时出错: {e}")
         sink_entropy = 0
@@ -847,87 +732,117 @@ def simulate_scenario(scenario_key):
             er = 0.0
             print(f"理想情况：er = 0")
     
+    result = {
+        'rs': rs, 'Rs': Rs, 'rc': rc, 'R_ci': R_ci, 'R_co': R_co, 'RI': RI, 'er': er
+    }
+    # 打印详细信息
+    if show_detail:
+        print_detail(result)
+    return result
+
+
+def write_res_metrics(scenario_key, result):
+    """将场景的目标指标写入结果文件，非理想场景共用一个文件，由主进程按场景顺序写入"""
     # 将所有的结果存到文件里面
     headers = ['输入数据率rs', '信源信息率Rs', '信道数据率rc', '信道输入信息率Rci',
                '信道输出信息率Rco', '信宿关于信源信息率RI', '信宿误码率er']
-    data = [rs, Rs, rc, R_ci, R_co, RI, er]
+    data = [result[k] for k in RES_METRICS_KEYS]
     formatted_data = [f"{num:.10f}" for num in data]
     # 对于非理想场景，使用统一的文件名，便于对比四种组合
     if scenario_key.startswith('non_ideal'):
         res_metrics_csv = os.path.join(METRIX_DIR, "non_ideal_res_metrics.csv")
     else:
-        res_metrics_csv = os.path.join(METRIX_DIR, f"{scenario_prefix}_res_metrics.csv")
+        res_metrics_csv = os.path.join(METRIX_DIR, f"{scenario_key}_res_metrics.csv")
     
-    # 检查文件是否存在以及是否为空
-    file_exists = os.path.isfile(res_metrics_csv) and os.path.getsize(res_metrics_csv) > 0
-    if file_exists:
-        # 文件已存在且有内容，只追加数据行
-        with open(res_metrics_csv, "a", newline='', encoding='utf-8') as f:
-            csv_writer = csv.writer(f)
-            csv_writer.writerow(formatted_data)
-    else:
-        # 文件不存在或为空，写入表头和数据行
-        with open(res_metrics_csv, "w", newline='', encoding='utf-8') as f:
-            csv_writer = csv.writer(f)
+    # 以追加模式打开，位置为0说明文件不存在或为空，先写表头
+    with open(res_metrics_csv, "a", newline='', encoding='utf-8') as f:
+        csv_writer = csv.writer(f)
+        if f.tell() == 0:
             csv_writer.writerow(headers)
-            csv_writer.writerow(formatted_data)
-    
-    # 打印详细信息
-    os.system(f"echo the target metrics data has been saved in {res_metrics_csv}")
-    if show_detail:
-        os.system("echo --------------------------the detailed info is below--------------------")
-        print(f"信源信息率Rs：{Rs:.10f}")
-        print(f"信道数据率rc：{rc:.10f}")
-        print(f"信道输入信息率Rci：{R_ci:.10f}")
-        print(f"信道输出信息率Rco：{R_co:.10f}")
-        print(f"信宿关于信源信息率RI：{RI:.10f}")
-        print(f"信宿误码率er：{er:.10f}")
-    
-    return {
-        'rs': rs, 'Rs': Rs, 'rc': rc, 'R_ci': R_ci, 'R_co': R_co, 'RI': RI, 'er': er
-    }
+        csv_writer.writerow(formatted_data)
+    print(f"the target metrics data has been saved in {res_metrics_csv}")
 
 
-# 主程序
-if __name__ == '__main__':
+def write_res_metrics_npz(results):
+    """
+    将本次运行各场景的目标指标追加到res_metrics.npz，便于多次运行后整体比较；
+    每个场景对应一个形状为(运行次数, 7)的float64数组，列顺序同RES_METRICS_KEYS
+    """
+    npz_file = os.path.join(METRIX_DIR, "res_metrics.npz")
+    try:
+        with np.load(npz_file) as old:
+            tables = {k: old[k] for k in old.files}
+    except FileNotFoundError:
+        tables = {}
+    for scenario_key, result in results:
+        row = np.array([[result[k] for k in RES_METRICS_KEYS]], dtype=np.float64)
+        tables[scenario_key] = np.vstack([tables[scenario_key], row]) if scenario_key in tables else row
+    # 先写临时文件再替换，中途出错时不会留下损坏的npz
+    tmp_file = f"{npz_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(f, **tables)
+    os.replace(tmp_file, npz_file)
+    print(f"the target metrics data has been appended to {npz_file}")
+
+
+def _run_scenario(job):
+    """进程池中运行单个场景，出错时返回None，不影响其他场景"""
+    scenario_key, msg_len, show_detail, seed = job
+    try:
+        return simulate_scenario(scenario_key, msg_len, show_detail, seed)
+    except Exception as e:
+        print(f"场景 {scenario_key} 仿真失败: {e}")
+        traceback.print_exc()
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_dirs(args.delete)
+
     print(f"\n{'='*80}")
     print("信息传输系统仿真程序")
     print(f"{'='*80}")
-    print(f"消息长度: {msg_len} 字节")
-    
-    if scenario_choice == 'all':
+    print(f"消息长度: {args.MSG_LEN} 字节")
+
+    if args.scenario == 'all':
         # 运行所有场景（理想场景 + 所有非理想场景）
-        results = {}
         scenario_keys = ['ideal'] + [k for k in SCENARIOS.keys() if k.startswith('non_ideal')]
-        for scenario_key in scenario_keys:
-            try:
-                result = simulate_scenario(scenario_key)
-                results[scenario_key] = result
-            except Exception as e:
-                print(f"场景 {scenario_key} 仿真失败: {e}")
-                import traceback
-                traceback.print_exc()
-    elif scenario_choice == 'non_ideal_all':
+    elif args.scenario == 'non_ideal_all':
         # 运行所有非理想场景（四种组合）
-        results = {}
         scenario_keys = [k for k in SCENARIOS.keys() if k.startswith('non_ideal')]
-        for scenario_key in scenario_keys:
-            try:
-                result = simulate_scenario(scenario_key)
-                results[scenario_key] = result
-            except Exception as e:
-                print(f"场景 {scenario_key} 仿真失败: {e}")
-                import traceback
-                traceback.print_exc()
     else:
         # 运行指定场景
-        try:
-            result = simulate_scenario(scenario_choice)
-        except Exception as e:
-            print(f"场景 {scenario_choice} 仿真失败: {e}")
-            import traceback
-            traceback.print_exc()
-    
+        scenario_keys = [args.scenario]
+
+    # 各场景使用由同一个种子派生的独立随机数流，并行运行时结果仍可复现
+    seeds = np.random.SeedSequence(args.seed).spawn(len(scenario_keys))
+    jobs = [(key, args.MSG_LEN, args.detail, s) for key, s in zip(scenario_keys, seeds)]
+
+    # 在创建进程池之前调用一次融合信道，安装了numba时在主进程中完成JIT编译，
+    # 各场景（子进程）直接使用编译结果，不再各自编译
+    run_bsc_rep3(np.zeros(8, np.uint8), 0.0, 0, np.zeros(8, np.uint8))
+    bsc_fused(np.zeros(8, np.uint8), np.array([1.0, 1.0]), np.random.default_rng(0))
+
+    # 各场景相互独立，多个场景时用进程池并行运行
+    processes = min(len(jobs), args.jobs or os.cpu_count() or 1)
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_run_scenario, jobs)
+    else:
+        results = [_run_scenario(job) for job in jobs]
+
+    completed = [(key, result) for key, result in zip(scenario_keys, results) if result is not None]
+    for scenario_key, result in completed:
+        write_res_metrics(scenario_key, result)
+    if args.npz and completed:
+        write_res_metrics_npz(completed)
+
     print(f"\n{'='*80}")
     print("仿真完成！")
     print(f"{'='*80}")
+
+
+# 主程序
+if __name__ == '__main__':
+    main()
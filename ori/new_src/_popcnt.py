@@ -0,0 +1,4 @@
+# 0~255每个字节中1的个数，各模块共用，POPCNT8[字节数组]即可按字节查表统计1的个数
+import numpy as np
+
+POPCNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
@@ -1,7 +1,8 @@
 import numpy as np
 import csv
 import argparse # 导入argparse模块，用于处理命令行参数
-import struct
+import functools
+import itertools
 import time,os
 
 
@@ -12,6 +13,8 @@ verbose_output = False  # 是否输出详细信息的标志
 input_file = ""  # 输入文件路径
 output_file = ""  # 输出文件路径
 msg_len = 0  # 生成消息的长度
+seed = None  # 随机种子，None表示不固定
+_rng = np.random.default_rng()  # 未传入rng时共用的随机数生成器，不必每次调用都重新取系统熵
 
 
 class CustomParser(argparse.ArgumentParser):
@@ -24,11 +27,13 @@ class CustomParser(argparse.ArgumentParser):
 
 def setup_cli():
     """设置命令行界面，解析命令行参数"""
-    global input_file, output_file, msg_len, verbose_output
+    global input_file, output_file, msg_len, verbose_output, seed
     # 创建自定义的命令行解析器实例
     cli = CustomParser(description="Simulation of Discrete Memoryless Source")
     # -v 或 --verbose：可选标志，用于启用详细输出
     cli.add_argument("-v", "--verbose", action="store_true", help="display detailed messages")
+    # --seed：可选参数，固定随机种子以便复现
+    cli.add_argument("--seed", type=int, default=None, help="random seed for reproducible messages")
     # INPUT：必需参数，指定要分析的源文件
     cli.add_argument("INPUT", type=str, help="path to the input file with symbol probability distribution")
     # OUTPUT：必需参数，指定存储分析结果的文件
@@ -42,6 +47,7 @@ def setup_cli():
     input_file = args.INPUT
     output_file = args.OUTPUT
     msg_len = args.MSG_LEN
+    seed = args.seed
     # 处理详细输出选项
     if args.verbose:
         global verbose_output
@@ -50,14 +56,12 @@ def setup_cli():
 
 # 从输入文件中读取符号概率分布
 def read_input(in_file_name):
-    symbol_prob = np.zeros(256)      # 创建一个大小为256的全零数组，用于存储符号概率分布
-    with open(in_file_name, "rt") as csvfile_read:
-        csv_reader = csv.reader(csvfile_read)
-        row = [r[1] for r in csv_reader]  # 读取第二列数据并保存在row列表中
-    for i in range(0, 256):
-        symbol_prob[i] = float(row[i])  # 将数据转换为浮点数并保存在符号概率分布数组中
+    # 只读取第二列（概率），由NumPy直接解析为float64数组
+    symbol_prob = np.loadtxt(in_file_name, delimiter=',', usecols=1, dtype=np.float64, ndmin=1)
+    if symbol_prob.size < 256:
+        raise ValueError(f"符号概率分布应有256行，实际只有{symbol_prob.size}行: {in_file_name}")
 
-    return symbol_prob
+    return symbol_prob[:256]
 
 
 def write_output(output_file_name, msg):
@@ -65,23 +69,38 @@ def write_output(output_file_name, msg):
     msg = np.clip(msg, 0, 255).astype(np.uint8)  # 将值限制在0-255之间，并转换为无符号8位整数
 
     with open(output_file_name, 'wb') as f:  # 以二进制方式写入，而不是字符串
-        for num in msg:
-            f.write(struct.pack("B", num))  # 将数据num打包成无符号的字符(B)
+        msg.tofile(f)  # 整个uint8缓冲区一次写入，每个数占一个字节
 
-def generate_msg(symbol_prob, length):
-    """根据符号概率分布生成指定长度的消息"""
-    cdf = np.cumsum(symbol_prob)  # 计算累积分布函数
-    symbol_random = np.random.uniform(size=length)  # 生成均匀分布的随机数
+@functools.lru_cache(maxsize=8)
+def _cached_cdf(in_file_name, mtime_ns, size):
+    """读取符号概率分布并计算累积分布函数；以文件的修改时间和大小为键，文件被重写后重新计算"""
+    cdf = np.cumsum(read_input(in_file_name))
+    cdf.flags.writeable = False  # 缓存的数组被多次调用共用，禁止修改
+    return cdf
+
+
+def cdf_for(in_file_name):
+    """返回概率分布文件对应的累积分布函数，同一文件内容只解析一次"""
+    st = os.stat(in_file_name)
+    return _cached_cdf(in_file_name, st.st_mtime_ns, st.st_size)
+
+
+def generate_msg(cdf, length, rng=None):
+    """根据累积分布函数cdf生成指定长度的消息"""
+    if rng is None:
+        rng = _rng
+    symbol_random = rng.random(length)  # 生成均匀分布的随机数
     msg = np.searchsorted(cdf, symbol_random)  # 使用反函数法生成符合给定分布的随机数
     return msg
 
 
-def workflow(INPUT, OUTPUT, MSG_LEN):
+def workflow(INPUT, OUTPUT, MSG_LEN, SEED=None):
     """执行整个工作流程：读取输入、生成消息、写入输出"""
     global start_time, end_time
     start_time = time.time()
-    symbol_prob = read_input(INPUT)  # 读取符号概率分布
-    msg = generate_msg(symbol_prob, MSG_LEN)  # 生成消息
+    cdf = cdf_for(INPUT)  # 读取符号概率分布并计算累积分布函数
+    # 生成消息：指定种子时用它新建生成器，否则使用模块共用的生成器
+    msg = generate_msg(cdf, MSG_LEN, None if SEED is None else np.random.default_rng(SEED))
     write_output(OUTPUT, msg)  # 写入输出文件
     end_time = time.time()
     if verbose_output:
@@ -91,7 +110,6 @@ def workflow(INPUT, OUTPUT, MSG_LEN):
 # 将2比特的概率分布转换成256比特的概率分布
 def DMS_2bit(file_2bit):
     symbol_prob_2bit = np.zeros(2)
-    symbol_prob_256 = np.zeros(256)
 
     # 固定使用同级 data/temp/file_2bit_to_256bit 目录（相对 src 目录的上级）
     temp_dir = os.path.join("..", "data", "temp", "file_2bit_to_256bit")
@@ -103,28 +121,36 @@ def DMS_2bit(file_2bit):
     name_without_ext = os.path.splitext(base_name)[0]        # e.g. "p=0.01"
     out_file_name = os.path.join(temp_dir, f"{name_without_ext}.256.csv")
 
-    with open(out_file_name, "w") as f:
-        with open(file_2bit) as in_file:
-            csv_reader = csv.reader(in_file)
-            for x, p in csv_reader:
-                symbol_prob_2bit[int(x)] = float(p)
+    # 多个场景并行时可能同时生成同一个文件，先写临时文件再原子替换，避免读到写了一半的文件
+    tmp_file_name = f"{out_file_name}.{os.getpid()}.tmp"
+    with open(file_2bit) as in_file:
+        csv_reader = csv.reader(in_file)
+        for x, p in csv_reader:
+            symbol_prob_2bit[int(x)] = float(p)
 
-        for i in range(256):
-            count = bin(i).count('1')
-            symbol_prob_256[i] = (symbol_prob_2bit[0] ** (8 - count)) * (symbol_prob_2bit[1] ** count)
-            f.write(f'{i},{symbol_prob_256[i]:.8f}\n')
+    # 字节i的概率 = p0^(i中0的个数) * p1^(i中1的个数)，各字节的1的个数一次算出
+    symbols = np.arange(256, dtype=np.uint8)
+    ones = np.unpackbits(symbols[:, np.newaxis], axis=1).sum(axis=1)
+    symbol_prob_256 = (symbol_prob_2bit[0] ** (8 - ones)) * (symbol_prob_2bit[1] ** ones)
+    np.savetxt(tmp_file_name, np.column_stack((symbols, symbol_prob_256)), fmt=['%d', '%.8f'], delimiter=',')
+    os.replace(tmp_file_name, out_file_name)
 
     return out_file_name
 
 
-if __name__ == '__main__':
-    """主函数，控制整个程序的执行流程"""
-    setup_cli()  # 设置命令行界面
-    num_lines = sum(1 for _ in open(input_file))  # 计算输入文件的行数
-    if num_lines == 2:
+def main(input_file, output_file, msg_len, seed=None):
+    """主函数，控制整个程序的执行流程，可在其他模块中直接调用"""
+    with open(input_file) as f:
+        head = list(itertools.islice(f, 3))  # 最多读3行即可判断是否恰好两行，不必扫描整个文件
+    if len(head) == 2:
         # 如果输入文件只有两行，说明是2比特分布，需要转换为256比特
         input_file_to_256_name = DMS_2bit(input_file)
     else:
         # 否则直接使用原输入文件
         input_file_to_256_name = input_file
-    workflow(input_file_to_256_name, output_file, msg_len)  # 执行主要工作流程
+    workflow(input_file_to_256_name, output_file, msg_len, seed)  # 执行主要工作流程
+
+
+if __name__ == '__main__':
+    setup_cli()  # 设置命令行界面
+    main(input_file, output_file, msg_len, seed)
@@ -3,21 +3,20 @@ import os
 import sys
 import numpy as np
 import csv
-from calcInfo import compute_info
+from calcInfo import entropy as symbol_entropy
+from _popcnt import POPCNT8
+
 def read_byte_dat(file_path):
     """
     读取 byte.dat 文件并生成 2 元 DMS 信源的概率分布。
     """
-    with open(file_path, 'rb') as f:
-        data = f.read()
+    data = np.fromfile(file_path, dtype=np.uint8)
 
     # 统计每个字节出现的次数
-    byte_counts = np.zeros(256, dtype=int)
-    for byte in data:
-        byte_counts[byte] += 1
+    byte_counts = np.bincount(data, minlength=256)
 
     # 计算每种字节的概率
-    total_bytes = len(data)
+    total_bytes = data.size
     symbol_prob_2bit = byte_counts / total_bytes
 
     return symbol_prob_2bit
@@ -32,42 +31,36 @@ def DMS_2bit_from_byte_dat(file_byte_dat, out_file_256):
     # 保存 256 元概率分布到输出文件
     with open(out_file_256, 'w', newline='') as csvfile:
         csv_writer = csv.writer(csvfile)
-        for i in range(256):
-            csv_writer.writerow([i, symbol_prob_2bit[i]])
+        csv_writer.writerows(zip(range(256), symbol_prob_2bit.tolist()))
 
     return symbol_prob_2bit
 
+def binary_probabilities(P):
+    """
+    由256元概率分布P（下标为字节值）计算数据比特概率。
+    """
+    P = np.asarray(P, dtype=np.float64)
+    count_1_p = POPCNT8[:len(P)] / 8
+    count_0_p = 1 - count_1_p
+    return np.sum(P * count_0_p), np.sum(P * count_1_p)
+
 def calculate_binary_probabilities(file_256):
     """
-    计算数据比特概率。
+    计算数据比特概率（从256元概率分布文件读取）。
     """
-    count_0_p = np.zeros(256)
-    count_1_p = np.zeros(256)
+    rows = np.loadtxt(file_256, delimiter=',', ndmin=2)
     P = np.zeros(256)
-
-    with open(file_256, newline='') as in_file:
-        csv_reader = csv.reader(in_file)
-        for i, row in enumerate(csv_reader):
-            symbol = int(row[0])
-            probability = float(row[1])
-            binary = format(symbol, '08b')  # 获取 8 位二进制表示
-            count_1 = binary.count('1')
-            count_0 = 8 - count_1
-            count_0_p[i] = count_0 / 8
-            count_1_p[i] = count_1 / 8
-            P[i] = probability
-
-    binary_p = np.zeros(2)
-    binary_p[0] = np.sum(P * count_0_p)
-    binary_p[1] = np.sum(P * count_1_p)
-
-    return binary_p[0], binary_p[1]
+    P[rows[:, 0].astype(int)] = rows[:, 1]
+    return binary_probabilities(P)
 
 def calculate_entropy(probabilities):
     """
     计算信息熵。
     """
-    entropy = -np.sum(probabilities * np.log2(probabilities))
+    # 只对非零概率求和（0*log0按0计），避免log2(0)产生的NaN污染结果
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    nz = probabilities[probabilities > 0]
+    entropy = np.sum(nz * np.log2(1 / nz))
     return entropy
 
 def calculate_redundancy(probabilities):
@@ -83,35 +76,32 @@ def calculate_redundancy(probabilities):
 def main(input_file, output_file_256, output_file_info):
     """
     主函数：处理输入文件并生成输出文件。
+    返回值：0表示成功，1表示输入文件不存在。
     """
     if not os.path.exists(input_file):
         print(f"Error: Input file '{input_file}' does not exist.")
-        sys.exit(1)
+        return 1
 
     # 从 byte.dat 文件生成 256 元概率分布文件
     symbol_prob_2bit = DMS_2bit_from_byte_dat(input_file, output_file_256)
 
-    # 计算数据比特概率
-    binary_p0, binary_p1 = calculate_binary_probabilities(output_file_256)
+    # 计算数据比特概率（直接使用内存中的概率分布，不再重新读取CSV）
+    binary_p0, binary_p1 = binary_probabilities(symbol_prob_2bit)
 
     # 计算信息熵和信源冗余度
     # entropy = calculate_entropy(np.array([binary_p0, binary_p1]))
-    file_ndarray = np.fromfile(input_file, dtype=np.uint8)
-    entropy = round(compute_info(file_ndarray)/8,10)
+    # 字节信息熵直接由已统计的256元概率分布计算，不再重新读取文件、重新统计
+    entropy = round(symbol_entropy(symbol_prob_2bit)/8,10)
     redundancy = calculate_redundancy(np.array([binary_p0, binary_p1]))
     headers = ['Bit 0 Probability','Bit 1 Probability','Entropy','Redundancy']
     data = [binary_p0,binary_p1,entropy,redundancy]
     # 保存数据比特概率、信息熵和信源冗余度到 CSV 文件
-    file_exists = os.path.isfile(output_file_info)
-    if file_exists:
-        with open(output_file_info, 'a', newline='') as info_file:
-            csv_writer = csv.writer(info_file)
-            csv_writer.writerow(data)
-    else:
-        with open(output_file_info, 'w', newline='') as info_file:
-            csv_writer = csv.writer(info_file)
-            csv_writer.writerow(headers)
-            csv_writer.writerow(data)
+    # 只有一行数据，直接拼成与csv.writer相同格式的文本（浮点数用repr、\r\n换行），一次写入
+    lines = ','.join(repr(float(v)) for v in data) + '\r\n'
+    if not os.path.isfile(output_file_info):
+        lines = ','.join(headers) + '\r\n' + lines
+    with open(output_file_info, 'a', newline='') as info_file:
+        info_file.write(lines)
 
 
         # csv_writer.writerow(['Data', 'Value'])
@@ -123,6 +113,7 @@ def main(input_file, output_file_256, output_file_info):
 
     # print(f"256-bit probability distribution saved to: {output_file_256}")
     # print(f"Data bit probabilities, entropy, and redundancy saved to: {output_file_info}")
+    return 0
 
 if __name__ == "__main__":
     if len(sys.argv) < 4:
@@ -133,4 +124,4 @@ if __name__ == "__main__":
     output_file_256 = sys.argv[2]
     output_file_info = sys.argv[3]
 
-    main(input_file, output_file_256, output_file_info)
\ No newline at end of file
+    sys.exit(main(input_file, output_file_256, output_file_info))
\ No newline at end of file
@@ -1,15 +1,24 @@
 import numpy as np
+import csv
+import os
 import argparse  # 导入argparse模块，用于处理命令行参数
-import timeit
+import time
+
+try:
+    from numba import njit, prange, get_num_threads
+except ImportError:  # 未安装numba时使用NumPy实现
+    njit = None
+
 # 全局变量定义
 verbose_output = False  # 是否输出详细信息的标志
 save_distribution = False  # 是否保存字节分布的标志
 distribution_file = ""  # 存储字节分布的文件路径
+NUMBA_MIN_SIZE = 1 << 24  # 数据不少于16MB时使用numba并行计算信息熵
 
 
 def probability(x):
-    #将数组x的元素分到256个区间的直方图中，hist对应每个区间的元素个数
-    (hist, bin_edges) = np.histogram(x, bins=range(257))
+    #统计数组x中0~255每个字节值出现的次数，hist对应每个值的元素个数
+    hist = np.bincount(x, minlength=256)
     P = hist/x.size
     return P
 
@@ -18,7 +27,27 @@ def self_info(P):
     return -np.log2(P)
 
 def entropy(P):
-    return np.sum(P*self_info(P))
+    #只对非零概率求和（0*log0按0计），不再生成替换零值的临时数组
+    nz = P[P > 0]
+    return float(np.sum(nz*np.log2(1/nz)))
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _entropy_u8(x, tiles):
+        # 每个线程把自己的一段数据计数到单独的一行，最后按列合并，避免多线程写同一个计数数组
+        n = x.size
+        counts = np.zeros((tiles, 256), np.int64)
+        step = (n + tiles - 1) // tiles
+        for t in prange(tiles):
+            for i in range(t * step, min(n, (t + 1) * step)):
+                counts[t, x[i]] += 1
+        total = counts.sum(axis=0)
+        h = 0.0
+        for k in range(256):
+            if total[k] > 0:
+                p = total[k] / n
+                h -= p * np.log2(p)
+        return h
 
 class CustomParser(argparse.ArgumentParser):
     """自定义命令行参数解析器，继承自argparse.ArgumentParser"""
@@ -63,6 +92,10 @@ def setup_cli():
 #计算输入文件的信息量
 #输入的x是一个numpy数组对象（此行可删）
 def compute_info(x):
+    # 大文件且不需要导出分布时，由numba一次遍历完成计数和求熵
+    if njit is not None and not save_distribution and x.size >= NUMBA_MIN_SIZE:
+        return _entropy_u8(np.asarray(x), get_num_threads())
+
     P = probability(x)
     info = entropy(P)	#计算输入文件的信息熵，即要求的信息量
 
@@ -78,47 +111,47 @@ def compute_info(x):
 
     return info
 
-def IO(input_file,output_file):
+def IO(input_file,output_file,file_ndarray=None):
     """
     参数:1.输入文件input_file（路径，str类型）
         2.输出文件output_file（路径，str类型）
+        3.file_ndarray：调用方已读入的文件内容（uint8数组），为None时从input_file读取
     功能：处理input_file，得到它的字节长度以及信息熵，将它的文件名称（路径），字节长度
         以及信息熵写入到输出文件中
     返回值：无
     """
     try:
-        # 将文件转成ndarray类型
-        file_ndarray = np.fromfile(input_file, dtype=np.uint8)
-
-        # 计算指定文件的信息熵。
+        # 以内存映射的方式打开文件，按需分页读入，不把整个文件复制到内存；空文件无法映射，按空数组处理
+        if file_ndarray is None:
+            if os.path.getsize(input_file) > 0:
+                file_ndarray = np.memmap(input_file, dtype=np.uint8, mode='r')
+            else:
+                file_ndarray = np.zeros(0, dtype=np.uint8)
+
+        # 计算指定文件的信息熵，同时记录耗时（详细输出时打印，不再重复计算10次）
+        start = time.perf_counter()
         I = compute_info(file_ndarray)
+        elapsed = time.perf_counter() - start
 
-        # 以二进制的方法读取该文件
-        with open(input_file,"rb") as f1:
-            data = f1.read() # 获取该文件的所有数据（数据都是字节形式）
-            length = len(data) # 获取文件字节数
+        # 文件字节数即数组长度，不再重新读取文件
+        length = file_ndarray.size
 
-            # 数据包含1.文件的名称，2.文件的信息熵（保留六位小数），3.文件的长度，用逗号分开
-            msg = ["\"{}\",".format(input_file),"\"{:.6f}\",".format(I),"\"{}\"".format(length)]
-
-            # 将数据添加到输出文件中
-            with open(output_file,mode = 'a',newline = '',encoding= 'utf-8') as f2:
-                for m in msg:
-                    f2.write(m) # 依次写入数据
-                f2.write("\r\n") # 换行
+        # 数据包含1.文件的名称，2.文件的信息熵（保留六位小数），3.文件的长度，每项加引号，用逗号分开
+        # 将数据添加到输出文件中，由csv模块处理路径中的引号、逗号
+        with open(output_file,mode = 'a',newline = '',encoding= 'utf-8') as f2:
+            csv.writer(f2, quoting=csv.QUOTE_ALL, lineterminator="\r\n").writerow([input_file, "{:.6f}".format(I), length])
 
         # 获取具体的文件细节
         if verbose_output:
-            time = timeit.timeit(lambda:compute_info(file_ndarray),number = 10)/10 #运行10次取平均值
-
             # 打印文件执行时间，每个符号（字节）的信息量，字节长度。
-            print("[", time," sec]", input_file, ":", "{:.6f}".format(I), "bit/sym,", length, "bytes")
+            print("[", elapsed," sec]", input_file, ":", "{:.6f}".format(I), "bit/sym,", length, "bytes")
     except Exception as e:
         print("发生错误",e)
 
-def main():
-    setup_cli()
-    IO(input_file,output_file)
+def main(input_file, output_file, data=None):
+    """计算input_file的信息熵并追加到output_file，可在其他模块中直接调用；data为已读入的文件内容"""
+    IO(input_file,output_file,data)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    setup_cli()
+    main(input_file, output_file)
\ No newline at end of file
@@ -11,32 +11,78 @@
 """
 
 import csv
+import mmap
 import os
+import sys
 import time
+import numpy as np
+
+
+def popcount(words: np.ndarray) -> int:
+    """
+    统计无符号整数数组中所有为1的比特数
+    """
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum(dtype=np.int64))
+    # NumPy < 2.0：把全部字节拼成一个大整数，由CPython在C层统计1的个数
+    value = int.from_bytes(words.tobytes(), 'little')
+    if sys.version_info >= (3, 10):
+        return value.bit_count()
+    return bin(value).count('1')
+
+# 打包比特文件的文件头标志，后面是8字节小端比特数和np.packbits打包的比特（与coding.py中的定义一致）
+PACKED_MAGIC = b'REP3BITS'
+
+# 计算汉明距离时每块的字节数（32KiB，可以放进L1/L2缓存）
+HAMMING_BLOCK_BYTES = 32 * 1024
+
+
+def map_file(file_path: str, maps: list = None) -> np.ndarray:
+    """
+    以只读内存映射的方式打开文件，返回uint8数组，不复制文件内容；
+    maps不为None时把映射对象加入其中，由调用方在数组释放后关闭
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return np.zeros(0, dtype=np.uint8)  # 空文件无法映射
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if maps is not None:
+        maps.append(mapped)
+    return np.frombuffer(mapped, dtype=np.uint8)
+
 
 class ChannelCodingMetrics:
     """
     信道编解码指标计算类
     """
 
-    def __init__(self, csv_file: str = "channel_coding_metrics.csv"):
+    def __init__(self, csv_file: str = "channel_coding_metrics.csv", verbose: bool = False):
         """
-        初始化指标计算器
+        初始化指标计算器，verbose为True时打印计算过程和结果摘要
         """
         self.csv_file = csv_file
+        self.verbose = verbose
+        self._maps = []  # 读取文件时打开的内存映射，计算完指标后关闭
+
+    def _close_maps(self):
+        """
+        关闭读取文件时打开的内存映射（Windows下映射未关闭时文件保持锁定）
+        """
+        while self._maps:
+            try:
+                self._maps.pop().close()
+            except BufferError:
+                pass  # 仍有数组引用该映射（如出错时的回溯），由数组释放时自动解除映射
 
     def read_binary_file(self, file_path: str) -> tuple:
         """
-        读取二进制文件并返回字节内容和比特串
+        读取二进制文件并返回字节内容（内存映射的uint8数组）和None；
+        比特数恒为字节数的8倍，汉明距离直接按字节计算，不再把整个文件展开为比特数组
         """
         try:
-            with open(file_path, 'rb') as f:
-                file_bytes = f.read()
+            file_bytes = map_file(file_path, self._maps)
 
-            # 将字节转换为比特串
-            bit_string = ''.join(f'{byte:08b}' for byte in file_bytes)
-
-            return file_bytes, bit_string
+            return file_bytes, None
 
         except FileNotFoundError:
             raise FileNotFoundError(f"文件不存在: {file_path}")
@@ -45,117 +91,143 @@ class ChannelCodingMetrics:
 
     def read_text_bits_file(self, file_path: str) -> tuple:
         """
-        读取纯文本比特文件（包含'0'和'1'字符的文件）
+        读取纯文本比特文件（包含'0'和'1'字符的文件），返回字节内容和比特数；
+        文件以PACKED_MAGIC开头时按打包的二进制格式读取，字节内容为打包后的比特；
+        只统计比特数，不生成比特数组
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
+            chars = map_file(file_path, self._maps)
+
+            if chars[:len(PACKED_MAGIC)].tobytes() == PACKED_MAGIC:
+                header_size = len(PACKED_MAGIC) + 8
+                bit_count = int.from_bytes(chars[len(PACKED_MAGIC):header_size].tobytes(), 'little')
+                # 比特数直接取自文件头，不展开打包的比特
+                return chars[header_size:], bit_count
 
-            # 移除所有非0/1字符（如空格、换行、注释等）
-            bit_string = ''.join(c for c in content if c in '01')
+            # 字节内容去掉首尾的空白字符
+            non_space = np.flatnonzero(~np.isin(chars, np.frombuffer(b' \t\n\r\x0b\x0c', dtype=np.uint8)))
+            content_bytes = chars[non_space[0]:non_space[-1] + 1] if non_space.size else chars[:0]
+            # 与文本模式读取一致（通用换行符）：\r\n按一个换行符计，Windows下写入的文件字节数不多算\r
+            if (content_bytes == ord('\r')).any():
+                content_bytes = np.frombuffer(content_bytes.tobytes().replace(b'\r\n', b'\n'), dtype=np.uint8)
 
-            return content.encode('utf-8'), bit_string
+            # 只统计'0'和'1'字符（不计空格、换行、注释等）；UTF-8多字节字符的各字节都不会等于'0'或'1'
+            bit_count = int(np.count_nonzero((chars == ord('0')) | (chars == ord('1'))))
+
+            return content_bytes, bit_count
 
         except FileNotFoundError:
             raise FileNotFoundError(f"文件不存在: {file_path}")
         except Exception as e:
             raise Exception(f"读取文件时出错: {e}")
 
-    def calculate_hamming_distance(self, bits1: str, bits2: str) -> tuple:
+    def calculate_hamming_distance(self, bytes1: np.ndarray, bytes2: np.ndarray) -> tuple:
         """
-        计算两个比特串之间的汉明距离（不同比特的数量）
+        计算两个字节数组之间的汉明距离（不同比特的数量），返回(汉明距离, 比较的比特数)；
+        两边长度不同时截断到较短的长度
         """
-        # 确保两个比特串长度相同，如果不同则截断到较短的长度
-        min_length = min(len(bits1), len(bits2))
-        bits1 = bits1[:min_length]
-        bits2 = bits2[:min_length]
-
-        # 计算不同比特的数量
-        distance = sum(1 for b1, b2 in zip(bits1, bits2) if b1 != b2)
-
-        return distance, min_length
+        compared_bytes = min(len(bytes1), len(bytes2))
+        distance = 0
+        # 每块只有HAMMING_BLOCK_BYTES大小，异或、计数都在缓存中完成
+        for i in range(0, compared_bytes, HAMMING_BLOCK_BYTES):
+            stop = min(i + HAMMING_BLOCK_BYTES, compared_bytes)
+            # 异或后按uint64统计1的个数即不同比特的数量
+            diff = bytes1[i:stop] ^ bytes2[i:stop]
+            if len(diff) % 8:
+                # 补0到8字节的整数倍，补的0不影响结果
+                diff = np.concatenate((diff, np.zeros(-len(diff) % 8, dtype=np.uint8)))
+            distance += popcount(diff.view(np.uint64))
+
+        return distance, compared_bytes * 8
 
     def calculate_metrics(self, original_file: str, encoded_file: str, decoded_file: str) -> dict:
         """
         计算所有性能指标
         """
-        print("\n" + "=" * 60)
-        print("开始计算信道编解码指标...")
-        print("=" * 60)
-
-        # 读取原始文件
-        print("\n1. 读取原始文件...")
-        original_bytes, original_bits = self.read_binary_file(original_file)
-        original_byte_count = len(original_bytes)
-        original_bit_count = len(original_bits)
-
-        print(f"   原始文件字节数: {original_byte_count}")
-        print(f"   原始文件比特数: {original_bit_count}")
+        # 每个文件只映射、读取一次：取得字节数、编码比特数并计算汉明距离后，释放数组并关闭内存映射
+        try:
+            # 读取原始文件
+            original_bytes, _ = self.read_binary_file(original_file)
+            original_byte_count = len(original_bytes)
+            original_bit_count = 8 * original_byte_count
 
-        # 读取编码文件
-        print("\n2. 读取编码文件...")
-        encoded_bytes, encoded_bits = self.read_text_bits_file(encoded_file)
-        encoded_byte_count = len(encoded_bytes)
-        encoded_bit_count = len(encoded_bits)
+            # 读取编码文件
+            encoded_bytes, encoded_bit_count = self.read_text_bits_file(encoded_file)
+            encoded_byte_count = len(encoded_bytes)
 
-        print(f"   编码文件字节数: {encoded_byte_count}")
-        print(f"   编码文件比特数: {encoded_bit_count}")
+            # 读取解码文件
+            decoded_bytes, _ = self.read_binary_file(decoded_file)
+            decoded_byte_count = len(decoded_bytes)
+            decoded_bit_count = 8 * decoded_byte_count
 
-        # 读取解码文件
-        print("\n3. 读取解码文件...")
-        decoded_bytes, decoded_bits = self.read_binary_file(decoded_file)
-        decoded_byte_count = len(decoded_bytes)
-        decoded_bit_count = len(decoded_bits)
+            # 计算误码率（汉明失真），直接在映射的字节上分块计算
+            hamming_distance, compared_bits = self.calculate_hamming_distance(original_bytes, decoded_bytes)
 
-        print(f"   解码文件字节数: {decoded_byte_count}")
-        print(f"   解码文件比特数: {decoded_bit_count}")
+            del original_bytes, encoded_bytes, decoded_bytes
+        finally:
+            self._close_maps()
 
         # 计算压缩比
-        print("\n4. 计算压缩比...")
         if encoded_byte_count > 0:
             compression_ratio = original_byte_count / encoded_byte_count
         else:
             compression_ratio = 0.0
 
-        print(f"   压缩比 = 原始文件字节数 / 编码文件字节数")
-        print(f"         = {original_byte_count} / {encoded_byte_count}")
-        print(f"         = {compression_ratio:.4f}")
-
-        # 计算误码率（汉明失真）
-        print("\n5. 计算误码率...")
-        hamming_distance, compared_bits = self.calculate_hamming_distance(original_bits, decoded_bits)
-
         if compared_bits > 0:
             bit_error_rate = hamming_distance / compared_bits
         else:
             bit_error_rate = 0.0
 
-        print(f"   汉明距离（错误比特数）: {hamming_distance}")
-        print(f"   比较的总比特数: {compared_bits}")
-        print(f"   误码率 = {hamming_distance} / {compared_bits}")
-        print(f"         = {bit_error_rate:.8f} ({bit_error_rate*100:.4f}%)")
-
         # 计算编码前的信源信息传输率
-        print("\n6. 计算编码前的信源信息传输率...")
         if original_byte_count > 0:
             original_info_rate = original_bit_count / original_byte_count
         else:
             original_info_rate = 0.0
 
-        print(f"   信息传输率 = 原始比特数 / 原始字节数")
-        print(f"             = {original_bit_count} / {original_byte_count}")
-        print(f"             = {original_info_rate:.4f} 比特/字节")
-
         # 计算编码后的信源信息传输率
-        print("\n7. 计算编码后的信源信息传输率...")
         if encoded_byte_count > 0:
             encoded_info_rate = original_bit_count / encoded_byte_count
         else:
             encoded_info_rate = 0.0
 
-        print(f"   信息传输率 = 原始比特数 / 编码文件字节数")
-        print(f"             = {original_bit_count} / {encoded_byte_count}")
-        print(f"             = {encoded_info_rate:.4f} 比特/字节")
+        # 只在需要时打印计算过程，关闭时不再格式化这些字符串
+        if self.verbose:
+            print("\n" + "=" * 60)
+            print("开始计算信道编解码指标...")
+            print("=" * 60)
+
+            print("\n1. 读取原始文件...")
+            print(f"   原始文件字节数: {original_byte_count}")
+            print(f"   原始文件比特数: {original_bit_count}")
+
+            print("\n2. 读取编码文件...")
+            print(f"   编码文件字节数: {encoded_byte_count}")
+            print(f"   编码文件比特数: {encoded_bit_count}")
+
+            print("\n3. 读取解码文件...")
+            print(f"   解码文件字节数: {decoded_byte_count}")
+            print(f"   解码文件比特数: {decoded_bit_count}")
+
+            print("\n4. 计算压缩比...")
+            print(f"   压缩比 = 原始文件字节数 / 编码文件字节数")
+            print(f"         = {original_byte_count} / {encoded_byte_count}")
+            print(f"         = {compression_ratio:.4f}")
+
+            print("\n5. 计算误码率...")
+            print(f"   汉明距离（错误比特数）: {hamming_distance}")
+            print(f"   比较的总比特数: {compared_bits}")
+            print(f"   误码率 = {hamming_distance} / {compared_bits}")
+            print(f"         = {bit_error_rate:.8f} ({bit_error_rate*100:.4f}%)")
+
+            print("\n6. 计算编码前的信源信息传输率...")
+            print(f"   信息传输率 = 原始比特数 / 原始字节数")
+            print(f"             = {original_bit_count} / {original_byte_count}")
+            print(f"             = {original_info_rate:.4f} 比特/字节")
+
+            print("\n7. 计算编码后的信源信息传输率...")
+            print(f"   信息传输率 = 原始比特数 / 编码文件字节数")
+            print(f"             = {original_bit_count} / {encoded_byte_count}")
+            print(f"             = {encoded_info_rate:.4f} 比特/字节")
 
         # 准备结果字典
         metrics = {
@@ -183,7 +255,8 @@ class ChannelCodingMetrics:
         self._save_to_csv_vertical(metrics)
 
         # 打印汇总
-        self._print_summary(metrics)
+        if self.verbose:
+            self._print_summary(metrics)
 
         return metrics
 
@@ -197,72 +270,73 @@ class ChannelCodingMetrics:
         # 获取当前时间戳
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
 
-        # 检查文件是否存在，如果不存在则创建并写入标题行
-        file_exists = os.path.exists(self.csv_file)
-
-        with open(self.csv_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-
-            # 如果是第一次写入，添加标题行
-            if not file_exists:
-                writer.writerow(["信道编解码指标分析报告"])
-                writer.writerow(["生成时间", timestamp])
-                writer.writerow([])  # 空行
-                writer.writerow(["指标类别", "指标名称", "指标值", "单位/说明"])
-
+        error_rate = metrics['bit_error_rate']
+        compression_ratio = metrics['compression_ratio']
+        rows = [
             # 写入空行作为分隔
-            writer.writerow([])
-            writer.writerow(["测试记录"])
-            writer.writerow(["测试时间", timestamp])
+            [],
+            ["测试记录"],
+            ["测试时间", timestamp],
 
             # 写入文件信息
-            writer.writerow(["文件信息", "编码前的文件", metrics['original_file'], ""])
-            writer.writerow(["文件信息", "编码后的文件", metrics['encoded_file'], ""])
-            writer.writerow(["文件信息", "解码后的文件", metrics['decoded_file'], ""])
-            writer.writerow([])  # 空行
+            ["文件信息", "编码前的文件", metrics['original_file'], ""],
+            ["文件信息", "编码后的文件", metrics['encoded_file'], ""],
+            ["文件信息", "解码后的文件", metrics['decoded_file'], ""],
+            [],  # 空行
 
             # 写入文件大小信息
-            writer.writerow(["文件大小", "原始文件字节数", metrics['original_byte_count'], "字节"])
-            writer.writerow(["文件大小", "原始文件比特数", metrics['original_bit_count'], "比特"])
-            writer.writerow(["文件大小", "编码文件字节数", metrics['encoded_byte_count'], "字节"])
-            writer.writerow(["文件大小", "编码文件比特数", metrics['encoded_bit_count'], "比特"])
-            writer.writerow(["文件大小", "解码文件字节数", metrics['decoded_byte_count'], "字节"])
-            writer.writerow(["文件大小", "解码文件比特数", metrics['decoded_bit_count'], "比特"])
-            writer.writerow([])  # 空行
+            ["文件大小", "原始文件字节数", metrics['original_byte_count'], "字节"],
+            ["文件大小", "原始文件比特数", metrics['original_bit_count'], "比特"],
+            ["文件大小", "编码文件字节数", metrics['encoded_byte_count'], "字节"],
+            ["文件大小", "编码文件比特数", metrics['encoded_bit_count'], "比特"],
+            ["文件大小", "解码文件字节数", metrics['decoded_byte_count'], "字节"],
+            ["文件大小", "解码文件比特数", metrics['decoded_bit_count'], "比特"],
+            [],  # 空行
 
             # 写入性能指标
-            writer.writerow(["性能指标", "压缩比", f"{metrics['compression_ratio']:.6f}",
-                           f"原始文件大小/编码文件大小 = {metrics['original_byte_count']}/{metrics['encoded_byte_count']}"])
-
-            writer.writerow(["性能指标", "误码率", f"{metrics['bit_error_rate']:.10f}",
-                           f"错误比特数/总比特数 = {metrics['hamming_distance']}/{metrics['compared_bits']}"])
-
-            writer.writerow(["性能指标", "编码前信源信息传输率", f"{metrics['original_info_rate']:.6f}",
-                           f"原始比特数/原始字节数 = {metrics['original_bit_count']}/{metrics['original_byte_count']}"])
-
-            writer.writerow(["性能指标", "编码后信源信息传输率", f"{metrics['encoded_info_rate']:.6f}",
-                           f"原始比特数/编码文件字节数 = {metrics['original_bit_count']}/{metrics['encoded_byte_count']}"])
-
-            writer.writerow([])  # 空行
+            ["性能指标", "压缩比", f"{compression_ratio:.6f}",
+             f"原始文件大小/编码文件大小 = {metrics['original_byte_count']}/{metrics['encoded_byte_count']}"],
+            ["性能指标", "误码率", f"{error_rate:.10f}",
+             f"错误比特数/总比特数 = {metrics['hamming_distance']}/{metrics['compared_bits']}"],
+            ["性能指标", "编码前信源信息传输率", f"{metrics['original_info_rate']:.6f}",
+             f"原始比特数/原始字节数 = {metrics['original_bit_count']}/{metrics['original_byte_count']}"],
+            ["性能指标", "编码后信源信息传输率", f"{metrics['encoded_info_rate']:.6f}",
+             f"原始比特数/编码文件字节数 = {metrics['original_bit_count']}/{metrics['encoded_byte_count']}"],
+            [],  # 空行
 
             # 写入附加信息
-            writer.writerow(["附加信息", "汉明距离", metrics['hamming_distance'], "不同比特的数量"])
-            writer.writerow(["附加信息", "比较的总比特数", metrics['compared_bits'], "实际比较的比特数"])
+            ["附加信息", "汉明距离", metrics['hamming_distance'], "不同比特的数量"],
+            ["附加信息", "比较的总比特数", metrics['compared_bits'], "实际比较的比特数"],
 
             # 写入评估结果
-            writer.writerow([])  # 空行
-            writer.writerow(["评估结果", "传输质量",
-                           "完美传输" if metrics['bit_error_rate'] == 0 else
-                           "良好传输" if metrics['bit_error_rate'] < 0.01 else
-                           "中等传输" if metrics['bit_error_rate'] < 0.1 else "较差传输",
-                           f"误码率: {metrics['bit_error_rate']*100:.4f}%"])
+            [],  # 空行
+            ["评估结果", "传输质量",
+             "完美传输" if error_rate == 0 else
+             "良好传输" if error_rate < 0.01 else
+             "中等传输" if error_rate < 0.1 else "较差传输",
+             f"误码率: {error_rate*100:.4f}%"],
+            ["评估结果", "压缩效果",
+             "压缩" if compression_ratio > 1 else "扩展",
+             f"压缩比: {compression_ratio:.4f}"],
+        ]
+
+        with open(self.csv_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
 
-            writer.writerow(["评估结果", "压缩效果",
-                           "压缩" if metrics['compression_ratio'] > 1 else "扩展",
-                           f"压缩比: {metrics['compression_ratio']:.4f}"])
+            # 追加模式下位置为0说明是新文件，先写入标题行
+            if f.tell() == 0:
+                writer.writerows([
+                    ["信道编解码指标分析报告"],
+                    ["生成时间", timestamp],
+                    [],  # 空行
+                    ["指标类别", "指标名称", "指标值", "单位/说明"],
+                ])
 
-        print(f"\n结果已保存到CSV文件: {self.csv_file}")
-        print("数据格式: 竖着显示，每个指标占一行")
+            writer.writerows(rows)
+
+        if self.verbose:
+            print(f"\n结果已保存到CSV文件: {self.csv_file}")
+            print("数据格式: 竖着显示，每个指标占一行")
 
     def _print_summary(self, metrics: dict):
         """
@@ -352,11 +426,6 @@ def main():
                 print("程序已退出")
                 break
 
-            # 检查文件是否存在
-            if not os.path.exists(original_file):
-                print(f"错误: 文件 '{original_file}' 不存在")
-                continue
-
             # 获取编码后的文件路径
             encoded_file = input("编码后的文件路径: ").strip()
             encoded_file = clean_file_path(encoded_file)
@@ -365,10 +434,6 @@ def main():
                 print("程序已退出")
                 break
 
-            if not os.path.exists(encoded_file):
-                print(f"错误: 文件 '{encoded_file}' 不存在")
-                continue
-
             # 获取解码后的文件路径
             decoded_file = input("解码后的文件路径: ").strip()
             decoded_file = clean_file_path(decoded_file)
@@ -377,13 +442,9 @@ def main():
                 print("程序已退出")
                 break
 
-            if not os.path.exists(decoded_file):
-                print(f"错误: 文件 '{decoded_file}' 不存在")
-                continue
-
-            # 计算指标
+            # 计算指标（文件是否存在由打开文件时的异常判断，不再单独检查）
             try:
-                calculator = ChannelCodingMetrics()
+                calculator = ChannelCodingMetrics(verbose=True)
                 metrics = calculator.calculate_metrics(original_file, encoded_file, decoded_file)
 
                 # 询问是否继续
@@ -393,6 +454,10 @@ def main():
                     print("程序已退出")
                     break
 
+            except FileNotFoundError as e:
+                print(f"错误: {e}")
+                continue
+
             except Exception as e:
                 print(f"计算过程中出现错误: {e}")
                 print("请检查文件格式是否正确。")
@@ -416,16 +481,16 @@ def view_csv_file():
     """
     csv_file = "channel_coding_metrics.csv"
 
-    if not os.path.exists(csv_file):
+    try:
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except FileNotFoundError:
         print(f"文件不存在: {csv_file}")
         return
 
     print(f"\n查看CSV文件内容: {csv_file}")
     print("=" * 60)
-
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-        print(content)
+    print(content)
 
 if __name__ == "__main__":
     print("信道编解码指标计算模块")
@@ -1,9 +1,19 @@
 import csv
 import os
 import numpy as np
-from decimal import Decimal, ROUND_HALF_UP
 import argparse
 
+try:
+    from numba import njit, prange
+except ImportError:  # 未安装numba时使用NumPy实现
+    njit = None
+
+# 分块处理时每块的字节数（64 KiB，展开后为512 Kib比特）
+CHUNK_SIZE = 65536
+
+# write_dat已经创建过的目录
+_known_dirs = set()
+
 def generate_probability_csv(filename, p_one):
     """
     生成包含0和1概率的CSV文件，其中0的概率为1减去1的概率。
@@ -45,16 +55,40 @@ def read_dat(filename):
 
 def write_dat(data, filename):
     # 将二进制数据写入DAT文件
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    data.tofile(filename)
+    dirname = os.path.dirname(filename)
+    if dirname and dirname not in _known_dirs:
+        # 同一目录只创建/检查一次
+        os.makedirs(dirname, exist_ok=True)
+        _known_dirs.add(dirname)
+    buf = memoryview(np.ascontiguousarray(data)).cast('B')
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        if hasattr(os, 'posix_fallocate') and buf.nbytes > 0:
+            # 预先分配连续的磁盘空间，减少大文件的碎片
+            try:
+                os.posix_fallocate(fd, 0, buf.nbytes)
+            except OSError:
+                pass  # 文件系统不支持时直接写入
+        # 直接写入数组的内存，os.write可能只写入一部分，循环写完
+        while buf:
+            buf = buf[os.write(fd, buf):]
+    finally:
+        os.close(fd)
+
+def iter_chunks(data, chunk_size=CHUNK_SIZE):
+    # 按固定大小依次返回data的切片（视图，不复制数据）
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
 
 def compute_cdf(p):
     # 计算给定概率分布的累计概率分布
     return np.array(p).cumsum()
 
-def get_data(cdf, msg_len):
+def get_data(cdf, msg_len, rng=None):
     # 生成给定概率分布长度相同的随机数
-    symbol_random = np.random.uniform(size=msg_len)
+    if rng is None:
+        rng = np.random.default_rng()
+    symbol_random = rng.random(msg_len)
     # 计算累积概率分布对应的字节符号
     msg = np.searchsorted(cdf, symbol_random, side='right').astype(np.uint8)
     return msg
@@ -70,9 +104,59 @@ def simulate_bsc(input_data, noise_data):
     # 模拟二元对称信道（BSC）
     return np.bitwise_xor(input_data, noise_data)
 
-def bsc_workflow(input_file_name, noise_file_name, out_file_name, noise_output_file_name, p_one, msg_len):
+if njit is not None:
+    @njit(cache=True)
+    def counter_uniform(seed, i):
+        # 基于计数器的随机数：第i个随机数只由(seed, i)经splitmix64混合得到，
+        # 与线程数和执行顺序无关，prange并行时结果仍可复现；返回[0, 1)内的浮点数
+        z = np.uint64(seed) + np.uint64(i) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+        return (z >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+    @njit(parallel=True, cache=True)
+    def _bsc_fused_numba(input_data, threshold, seed, noise_out, out):
+        # 一次遍历同时生成噪声并异或，每个字节只读写一次；
+        # 第i个字节的随机数为counter_uniform(seed, i)，相同种子的结果逐位相同
+        for i in prange(input_data.size):
+            noise = 1 if counter_uniform(seed, i) >= threshold else 0
+            noise_out[i] = noise
+            out[i] = input_data[i] ^ noise
+
+def bsc_fused(input_data, noise_cdf, rng=None):
+    """
+    生成噪声并通过BSC，返回(噪声数据, 信道输出)；
+    与 simulate_bsc(input_data, get_data(noise_cdf, len(input_data), rng)) 的统计特性相同，
+    但按块（或由numba逐字节）完成，噪声生成和异或之间不再整段经过内存
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    input_data = np.asarray(input_data, dtype=np.uint8)
+    noise_data = np.empty_like(input_data)
+    output_data = np.empty_like(input_data)
+    if njit is not None and len(noise_cdf) == 2:
+        # 二元噪声：随机数不小于P(0)时噪声为1
+        _bsc_fused_numba(input_data, float(noise_cdf[0]), int(rng.integers(2**31)), noise_data, output_data)
+    else:
+        # 分块生成的随机数序列与一次生成相同，结果与不分块时一致
+        for start in range(0, len(input_data), CHUNK_SIZE):
+            stop = start + CHUNK_SIZE
+            if len(noise_cdf) == 2:
+                # 二元噪声直接比较：随机数不小于P(0)时为1；
+                # 只和一个概率比较，float32的精度足够，随机数占用的内存和带宽减半
+                symbol_random = rng.random(len(input_data[start:stop]), dtype=np.float32)
+                noise = (symbol_random >= np.float32(noise_cdf[0])).astype(np.uint8)
+            else:
+                symbol_random = rng.random(len(input_data[start:stop]))
+                noise = np.searchsorted(noise_cdf, symbol_random, side='right').astype(np.uint8)
+            noise_data[start:stop] = noise
+            np.bitwise_xor(input_data[start:stop], noise, out=output_data[start:stop])
+    return noise_data, output_data
+
+def bsc_workflow(input_file_name, noise_file_name, out_file_name, noise_output_file_name, p_one, msg_len, rng=None):
     """
-    二元对称信道（BSC）工作流。
+    二元对称信道（BSC）工作流。rng为噪声使用的随机数生成器，默认新建一个。
     """
     # 生成噪声文件
     generate_probability_csv(noise_file_name, p_one)
@@ -81,12 +165,10 @@ def bsc_workflow(input_file_name, noise_file_name, out_file_name, noise_output_f
     noise_cdf = compute_cdf(list(noise_prob.values()))
     # 读取输入数据
     input_data = read_dat(input_file_name)
-    # 生成噪声数据
-    noise_data = get_data(noise_cdf, len(input_data))
+    # 生成噪声数据并模拟BSC
+    noise_data, output_data = bsc_fused(input_data, noise_cdf, rng)
     # 写入噪声数据到文件
     write_dat(noise_data, noise_output_file_name)
-    # 模拟BSC
-    output_data = simulate_bsc(input_data, noise_data)
     # 写入输出数据
     write_dat(output_data, out_file_name)
 
@@ -1,7 +1,5 @@
 import csv
-import os
 import numpy as np
-from decimal import Decimal, ROUND_HALF_UP
 import argparse
 
 def parse_sys_args():
@@ -25,14 +23,18 @@ def calculate_channel_probabilities(input_data, noise_data):
     计算信道转移概率。
     """
     num_states = 256
-    transition_counts = np.zeros((num_states, num_states))
-    for x, y in zip(input_data, noise_data):
-        transition_counts[x, y] += 1
+    # 把(x, y)打包成一个16位下标，用bincount一次统计联合频数
+    x = np.asarray(input_data, dtype=np.uint8).astype(np.int32)
+    y = np.asarray(noise_data, dtype=np.uint8).astype(np.int32)
+    n = min(len(x), len(y))
+    transition_counts = np.bincount((x[:n] << 8) | y[:n], minlength=num_states * num_states)
+    transition_counts = transition_counts.reshape(num_states, num_states).astype(np.float64)
     # 避免除零错误：如果某行全为0，则保持为0
     row_sums = np.sum(transition_counts, axis=1, keepdims=True)
-    transition_probabilities = np.where(row_sums > 0, 
-                                       transition_counts / row_sums, 
-                                       0)
+    # 只在行和大于0的位置做除法，不再先对全0行计算0/0再替换
+    transition_probabilities = np.divide(transition_counts, row_sums,
+                                         out=np.zeros_like(transition_counts),
+                                         where=row_sums > 0)
     return transition_probabilities
 
 def calculate_mutual_information(transition_probabilities):
@@ -41,17 +43,13 @@ def calculate_mutual_information(transition_probabilities):
     互信息 I(X;Y) = sum(p(x,y) * log2(p(x,y) / (p(x) * p(y))))
     理论上互信息应该是非负的。
     """
-    p_x = np.sum(transition_probabilities, axis=1)
-    p_y = np.sum(transition_probabilities, axis=0)
-    mi = 0
-    for i in range(len(p_x)):
-        for j in range(len(p_y)):
-            if transition_probabilities[i][j] > 0:
-                # 避免除零错误
-                if p_x[i] > 0 and p_y[j] > 0:
-                    ratio = transition_probabilities[i][j] / (p_x[i] * p_y[j])
-                    if ratio > 0:
-                        mi += transition_probabilities[i][j] * np.log2(ratio)
+    P = np.asarray(transition_probabilities, dtype=np.float64)
+    p_x = np.sum(P, axis=1, keepdims=True)
+    p_y = np.sum(P, axis=0, keepdims=True)
+    denom = p_x * p_y
+    # 只对p(x,y)>0且p(x)p(y)>0的元素求和，避免除零错误
+    safe = (P > 0) & (denom > 0)
+    mi = float(np.sum(P[safe] * np.log2(P[safe] / denom[safe])))
     # 互信息理论上应该非负，如果出现负值，可能是数值误差，返回0或绝对值
     if mi < 0:
         # 负值可能是数值误差，返回0（互信息最小为0）
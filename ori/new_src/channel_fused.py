@@ -0,0 +1,61 @@
+"""
+信道融合模块 - 重复码(N=3)编码 + BSC + 多数投票解码
+功能：对字节数据逐比特完成重复编码、通过BSC、多数投票解码，直接得到恢复后的字节
+原理：每个比特重复3次后各自以概率p翻转，3次中至少2次翻转时该比特解码出错；
+      整个过程不生成编码、噪声、信道输出等中间比特流
+"""
+
+import numpy as np
+
+from decoding import majority_vote_decode_planes
+
+try:
+    from numba import njit, prange
+    from channel import counter_uniform
+except ImportError:  # 未安装numba时使用NumPy实现
+    njit = None
+
+
+def _run_bsc_rep3_numpy(data_in, p, seed, data_out):
+    """
+    NumPy实现：生成3个打包的翻转平面，多数翻转的比特出错
+    """
+    rng = np.random.default_rng(seed)
+    flips = np.packbits(rng.random((3, len(data_in) * 8)) < p, axis=1)
+    data_out[:] = data_in ^ majority_vote_decode_planes(flips)
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _run_bsc_rep3_numba(data_in, p, seed, data_out):
+        # 第i个字节第k位的第j次传输使用counter_uniform(seed, 24*i + 3*k + j)，
+        # 与线程数和执行顺序无关，相同种子的结果逐位相同
+        for i in prange(len(data_in)):
+            byte = data_in[i]
+            out = 0
+            for k in range(8):
+                flips = 0
+                for j in range(3):
+                    if counter_uniform(seed, 24 * i + 3 * k + j) < p:
+                        flips += 1
+                bit = (byte >> k) & 1
+                if flips >= 2:
+                    bit ^= 1
+                out |= bit << k
+            data_out[i] = out
+
+
+def run_bsc_rep3(data_in, p, seed, data_out):
+    """
+    重复码(N=3) + BSC + 多数投票解码的融合计算
+
+    参数:
+        data_in: 输入字节（uint8数组）
+        p: BSC错误传递概率
+        seed: 随机种子
+        data_out: 与data_in等长的uint8数组，用于保存恢复后的字节
+    """
+    if njit is not None:
+        _run_bsc_rep3_numba(data_in, p, seed, data_out)
+    else:
+        _run_bsc_rep3_numpy(data_in, p, seed, data_out)
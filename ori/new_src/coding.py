@@ -2,13 +2,19 @@
 信道编码模块 - 重复码编码器 (N=3)
 功能：从文件读取二进制比特串，进行重复编码，将结果保存到txt文件
 输入：包含二进制比特串的文件路径
-输出：编码后的比特串保存到txt文件
+输出：编码后的比特串保存到txt文件（或打包的二进制文件）
 原理：每个比特重复3次，增加冗余以提高可靠性
 """
 
 import os
-import re
 from datetime import datetime
+import numpy as np
+
+# 除b'0'和b'1'以外的所有字节，bytes.translate删除这些字节即可提取比特串（UTF-8多字节字符的各字节也会被删除）
+NON_BIT_BYTES = bytes(b for b in range(256) if b not in b'01')
+
+# 打包比特文件的文件头标志，后面是8字节小端比特数和np.packbits打包的比特（与calculate.py中的定义一致）
+PACKED_MAGIC = b'REP3BITS'
 
 def clean_file_path(file_path):
     """
@@ -56,7 +62,11 @@ class RepetitionCodeEncoder:
         if not bit_string:
             return False
 
-        return all(c in '01' for c in bit_string)
+        # 删除所有'0'和'1'后没有剩余字节，说明是有效的比特串
+        try:
+            return not bit_string.encode('ascii').translate(None, b'01')
+        except UnicodeEncodeError:
+            return False
 
     def encode_bit_string(self, bit_string: str) -> str:
         """
@@ -66,9 +76,23 @@ class RepetitionCodeEncoder:
         if not self.validate_bit_string(bit_string):
             raise ValueError("输入必须为二进制比特串（仅包含0和1）")
 
-        # 对每个比特重复3次
-        encoded_bits = ''.join(bit * self.N for bit in bit_string)
-        return encoded_bits
+        # '0'/'1'字符的码字就是该字符重复N次，直接在ASCII字节上重复，不再转换为0/1数组再转换回来
+        chars = np.frombuffer(bit_string.encode('ascii'), dtype=np.uint8)
+        return self.encode_bits_array(chars).tobytes().decode('ascii')
+
+    def encode_bits_array(self, bits: np.ndarray) -> np.ndarray:
+        """
+        对0/1比特数组进行重复编码，每个比特重复N次
+        """
+        return np.repeat(bits, self.N)
+
+    def encode_planes(self, data: np.ndarray) -> np.ndarray:
+        """
+        按码字平面进行重复编码：输入为按字节打包的比特（uint8数组），
+        输出形状为(N, len(data))，每一行都是输入的一份拷贝，
+        与encode_bits_array的交织排列(b b b)相比，各平面可以整字节/整字并行处理
+        """
+        return np.repeat(np.asarray(data, dtype=np.uint8)[np.newaxis, :], self.N, axis=0)
 
     def read_bit_string_from_file(self, file_path: str) -> str:
         """
@@ -81,8 +105,11 @@ class RepetitionCodeEncoder:
         print(f"当前工作目录: {os.getcwd()}")
 
         try:
-            # 检查文件是否存在
-            if not os.path.exists(file_path):
+            # 直接打开文件，打开失败时再判断为文件不存在（不再先单独检查）
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+            except FileNotFoundError:
                 # 尝试列出当前目录文件，帮助调试
                 print(f"文件 '{file_path}' 不存在")
                 print("尝试列出当前目录文件:")
@@ -96,12 +123,8 @@ class RepetitionCodeEncoder:
                     pass
                 raise FileNotFoundError(f"文件不存在: {file_path}")
 
-            # 读取文件
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-
             # 提取所有0和1字符
-            bit_string = ''.join(c for c in content if c in '01')
+            bit_string = content.encode('utf-8').translate(None, NON_BIT_BYTES).decode('ascii')
 
             if not bit_string:
                 raise ValueError("文件中没有找到有效的二进制比特（0或1）")
@@ -170,13 +193,27 @@ class RepetitionCodeEncoder:
 
             # 写入编码后的完整比特序列
             f.write("# 3. 编码后的完整比特序列\n")
-            # 每3个比特（一个码字）加一个空格便于阅读
-            formatted_encoded = ' '.join([encoded_bits[i:i+3] for i in range(0, len(encoded_bits), 3)])
-            # 每10个码字换行
-            groups = formatted_encoded.split(' ')
-            for i in range(0, len(groups), 10):
-                line = ' '.join(groups[i:i+10])
-                f.write(line + '\n')
+            # 每3个比特（一个码字）加一个空格便于阅读，每10个码字换行
+            groups = [encoded_bits[i:i+3] for i in range(0, len(encoded_bits), 3)]
+            f.writelines(' '.join(groups[i:i+10]) + '\n' for i in range(0, len(groups), 10))
+
+        return output_file_path
+
+    def save_encoded_packed(self, encoded_bits, output_file_path: str) -> str:
+        """
+        将编码后的比特按每8比特一字节打包保存为二进制文件，文件大小约为文本格式的1/8
+        encoded_bits可以是'0'/'1'比特串或0/1数组
+        """
+        output_file_path = clean_file_path(output_file_path)
+
+        if isinstance(encoded_bits, str):
+            encoded_bits = np.frombuffer(encoded_bits.encode('ascii'), dtype=np.uint8) - ord('0')
+
+        # 文件头：标志 + 比特数（去掉打包时末尾补的0）
+        with open(output_file_path, 'wb') as f:
+            f.write(PACKED_MAGIC)
+            f.write(len(encoded_bits).to_bytes(8, 'little'))
+            np.packbits(encoded_bits).tofile(f)
 
         return output_file_path
 
@@ -248,14 +285,17 @@ def main():
                 # 询问输出文件路径
                 base_name = os.path.splitext(os.path.basename(input_file_path_clean))[0]
                 default_output = f"{base_name}_encoded.txt"
-                output_file_path = input(f"\n请输入输出文件路径 [默认: {default_output}]: ").strip()
+                output_file_path = input(f"\n请输入输出文件路径（以.bin结尾时保存为打包的二进制格式） [默认: {default_output}]: ").strip()
 
                 if not output_file_path:
                     output_file_path = default_output
 
                 try:
-                    saved_file = encoder.save_encoded_result(original_bits, encoded_result,
-                                                           input_file_path_clean, output_file_path)
+                    if output_file_path.endswith('.bin'):
+                        saved_file = encoder.save_encoded_packed(encoded_result, output_file_path)
+                    else:
+                        saved_file = encoder.save_encoded_result(original_bits, encoded_result,
+                                                               input_file_path_clean, output_file_path)
                     print(f"✓ 编码结果已保存到文件: {saved_file}")
 
                     # 显示文件信息
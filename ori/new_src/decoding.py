@@ -6,8 +6,37 @@
 原理：对每3个比特进行多数投票，选择出现次数最多的值作为解码结果
 """
 
+import mmap
 import os
-import re
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # 未安装numba时使用NumPy实现
+    njit = None
+
+# 除b'0'和b'1'以外的所有字节，bytes.translate删除这些字节即可提取比特串（UTF-8多字节字符的各字节也会被删除）
+NON_BIT_BYTES = bytes(b for b in range(256) if b not in b'01')
+
+# 把除b'0'和b'1'以外的字节都映射为空格的转换表，translate后split即可得到所有连续的比特串
+BIT_RUN_TABLE = bytes(b if b in b'01' else 0x20 for b in range(256))
+
+# 编码文件中完整比特序列部分的标题
+FULL_SEQUENCE_MARKER = "编码后的完整比特序列".encode('utf-8')
+
+# 提取比特时每次处理的字节数（1MiB），临时数据只与块大小有关
+READ_CHUNK_SIZE = 1 << 20
+
+# 编码比特不少于1M个时使用numba并行多数投票
+NUMBA_MIN_SIZE = 1 << 20
+
+if njit is not None:
+    @njit(parallel=True, boundscheck=False, cache=True)
+    def _maj3_numba(src, dst, base):
+        # src为'0'/'1'字符或0/1，最低位即比特值；一次遍历直接写出解码结果，不生成中间数组
+        for i in prange(dst.size):
+            ones = (src[3 * i] & 1) + (src[3 * i + 1] & 1) + (src[3 * i + 2] & 1)
+            dst[i] = base + (1 if ones >= 2 else 0)
 
 def clean_file_path(file_path):
     """
@@ -36,6 +65,44 @@ def clean_file_path(file_path):
 
     return file_path
 
+def _filter_bits(buf, start=0):
+    """按块删除buf[start:]中除'0'和'1'以外的字节，返回bytearray"""
+    bits = bytearray()
+    for i in range(start, len(buf), READ_CHUNK_SIZE):
+        bits += buf[i:i + READ_CHUNK_SIZE].translate(None, NON_BIT_BYTES)
+    return bits
+
+def _longest_bit_run(buf):
+    """按块查找buf中最长的连续0/1串（有多个时取第一个），跨块的串会拼接起来"""
+    longest = b''
+    run = []  # 当前未结束的串（可能跨越多个块）
+    for i in range(0, len(buf), READ_CHUNK_SIZE):
+        parts = buf[i:i + READ_CHUNK_SIZE].translate(BIT_RUN_TABLE).split(b' ')
+        # 第一段接在上一块末尾的串之后，最后一段可能在下一块继续
+        run.append(parts[0])
+        if len(parts) > 1:
+            candidates = [b''.join(run)] + parts[1:-1]
+            run = [parts[-1]]
+            for part in candidates:
+                if len(part) > len(longest):
+                    longest = part
+    tail = b''.join(run)
+    return tail if len(tail) > len(longest) else longest
+
+def wrap_bits(bits, width=80):
+    """把比特串每width个字符分为一行（每行以换行结尾），一次生成整个文本"""
+    n = len(bits)
+    if n == 0:
+        return ""
+    idx = np.arange(n)
+    lines = -(-n // width)
+    out = np.empty(n + lines, dtype=np.uint8)
+    # 第i个字符前面有i//width个换行符；第k行的换行符在该行最后一个字符之后
+    out[idx + idx // width] = np.frombuffer(bits.encode('ascii'), dtype=np.uint8)
+    line_end = np.minimum(np.arange(1, lines + 1) * width, n)
+    out[line_end + np.arange(lines)] = ord('\n')
+    return out.tobytes().decode('ascii')
+
 def extract_encoded_bits_from_file(input_file):
     """
     从输入文件中提取编码后的比特序列
@@ -50,8 +117,13 @@ def extract_encoded_bits_from_file(input_file):
         # 先清理文件路径
         input_file = clean_file_path(input_file)
 
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # 以只读内存映射的方式按字节访问，不把整个文件读入内存，也不解码为str；
+        # 比特只由ASCII的'0'和'1'组成。空文件无法映射，按空内容处理
+        with open(input_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                content = b''
+            else:
+                content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
     except FileNotFoundError as e:
         print(f"文件未找到错误: {e}")
         return ""
@@ -63,35 +135,28 @@ def extract_encoded_bits_from_file(input_file):
         return ""
 
     # 方法1：查找"编码后的完整比特序列"部分
-    if "编码后的完整比特序列" in content:
-        # 找到该部分之后的内容
-        start_idx = content.find("编码后的完整比特序列") + len("编码后的完整比特序列")
-
-        # 提取该行之后直到下一个标题或文件结束的内容
-        remaining_content = content[start_idx:]
-
-        # 提取所有0和1字符
-        bits = ''.join([c for c in remaining_content if c in '01'])
+    marker_idx = content.find(FULL_SEQUENCE_MARKER)
+    if marker_idx >= 0:
+        # 提取该标题之后直到文件结束的内容中所有0和1字符
+        bits = _filter_bits(content, marker_idx + len(FULL_SEQUENCE_MARKER))
 
         if bits:
             print(f"从'编码后的完整比特序列'部分提取到 {len(bits)} 个比特")
-            return bits
+            return bits.decode('ascii')
 
     # 方法2：查找纯比特序列（没有空格的连续0和1）
-    # 使用正则表达式查找连续的0和1
-    bit_patterns = re.findall(r'[01]+', content)
-    if bit_patterns:
-        # 找出最长的连续比特串（最可能是编码后的比特序列）
-        longest_bits = max(bit_patterns, key=len)
+    # 其他字节都换成空格后按空格分割，找出最长的连续比特串（最可能是编码后的比特序列）
+    longest_bits = _longest_bit_run(content)
+    if longest_bits:
         if len(longest_bits) >= 10:  # 假设至少有10个比特才是有效的编码序列
             print(f"找到连续比特串，长度: {len(longest_bits)}")
-            return longest_bits
+            return longest_bits.decode('ascii')
 
     # 方法3：提取文件中所有的0和1字符
-    all_bits = ''.join([c for c in content if c in '01'])
+    all_bits = _filter_bits(content)
     if all_bits:
         print(f"提取所有0/1字符，得到 {len(all_bits)} 个比特")
-        return all_bits
+        return all_bits.decode('ascii')
 
     print("警告: 无法从文件中提取比特序列")
     return ""
@@ -101,42 +166,76 @@ def majority_vote_decode(encoded_bits, n=3):
     使用多数投票原则进行重复码解码
 
     参数:
-        encoded_bits: 编码后的比特串
+        encoded_bits: 编码后的比特串（str），或由0/1组成的uint8数组
         n: 重复次数，固定为3
 
     返回:
-        str: 解码后的比特串
+        str或np.ndarray: 解码后的比特串，类型与输入一致
     """
-    if not encoded_bits:
+    if len(encoded_bits) == 0:
         raise ValueError("编码比特串为空")
 
-    if len(encoded_bits) % n != 0:
-        print(f"警告: 编码比特串长度 {len(encoded_bits)} 不是{n}的整数倍")
-        # 截断到最接近的n的倍数
-        truncated_length = (len(encoded_bits) // n) * n
-        encoded_bits = encoded_bits[:truncated_length]
-        print(f"已截断为 {len(encoded_bits)} 个比特")
+    is_str = isinstance(encoded_bits, str)
+    if is_str:
+        bits = np.frombuffer(encoded_bits.encode('ascii'), dtype=np.uint8)
+    else:
+        bits = np.asarray(encoded_bits, dtype=np.uint8)
 
-    decoded_bits = []
-
-    # 每n个比特为一组进行解码
-    for i in range(0, len(encoded_bits), n):
-        group = encoded_bits[i:i+n]
+    if len(bits) % n != 0:
+        print(f"警告: 编码比特串长度 {len(bits)} 不是{n}的整数倍")
+        # 截断到最接近的n的倍数
+        truncated_length = (len(bits) // n) * n
+        bits = bits[:truncated_length]
+        print(f"已截断为 {len(bits)} 个比特")
+
+    # 长比特串（N=3）由numba直接在字符/比特上投票
+    if njit is not None and n == 3 and len(bits) >= NUMBA_MIN_SIZE:
+        decoded_bits = np.empty(len(bits) // 3, dtype=np.uint8)
+        _maj3_numba(bits, decoded_bits, ord('0') if is_str else 0)
+        return decoded_bits.tobytes().decode('ascii') if is_str else decoded_bits
+
+    # N=3时三个跨步切片按位求多数：maj(a, b, c) = (a & b) | (a & c) | (b & c)
+    # '0'/'1'的高位相同（0x30），对字符直接运算即得到结果字符，不需要先减再加ord('0')
+    if n == 3:
+        a, b, c = bits[0::3], bits[1::3], bits[2::3]
+        decoded_bits = (a & b) | (a & c) | (b & c)
+        return decoded_bits.tobytes().decode('ascii') if is_str else decoded_bits
+
+    if is_str:
+        bits = bits - ord('0')
+
+    # 每n个比特为一组，组内1的个数超过n//2时判为1（即最多纠正(n-1)//2个错误）
+    # 平票情况（n为偶数时）按照约定选择0
+    # 按组内位置取n个跨步切片逐个相加（n=3时为3次整数组加法），比reshape后按行求和快一个数量级
+    ones = np.zeros(len(bits) // n, dtype=np.uint8)
+    for k in range(n):
+        ones += bits[k::n]
+    decoded_bits = (ones > n // 2).astype(np.uint8)
+
+    if is_str:
+        return (decoded_bits + ord('0')).tobytes().decode('ascii')
+    return decoded_bits
+
+def majority_vote_decode_planes(planes):
+    """
+    对按码字平面排列的打包比特进行多数投票解码（N=3）
 
-        # 统计0和1的个数
-        count_0 = group.count('0')
-        count_1 = group.count('1')
+    参数:
+        planes: 形状为(3, 字节数)的uint8数组，每一行是一个码字平面
 
-        # 多数投票：选择出现次数多的比特
-        if count_0 > count_1:
-            decoded_bits.append('0')
-        elif count_1 > count_0:
-            decoded_bits.append('1')
-        else:
-            # 平票情况，按照约定选择0
-            decoded_bits.append('0')
+    返回:
+        np.ndarray: 解码后的打包比特（uint8数组）
+    """
+    planes = np.asarray(planes, dtype=np.uint8)
+    if planes.ndim != 2 or planes.shape[0] != 3:
+        raise ValueError("平面多数投票仅支持N=3，输入形状应为(3, 字节数)")
 
-    return ''.join(decoded_bits)
+    # 补齐到8字节的整数倍，按uint64一次处理64个比特：maj(A, B, C) = (A & B) | (A & C) | (B & C)
+    length = planes.shape[1]
+    padded = np.zeros((3, -(-length // 8) * 8), dtype=np.uint8)
+    padded[:, :length] = planes
+    a, b, c = padded.view(np.uint64)
+    return ((a & b) | (a & c) | (b & c)).view(np.uint8)[:length]
 
 def repetition_decode_file(input_file, output_file):
     """
@@ -213,8 +312,7 @@ def repetition_decode_file(input_file, output_file):
             # 写入解码后的比特序列
             f.write("# 解码后的比特序列\n")
             # 每80个比特换行，便于阅读
-            for i in range(0, len(decoded_bits), 80):
-                f.write(decoded_bits[i:i+80] + '\n')
+            f.write(wrap_bits(decoded_bits, 80))
 
         print(f"解码完成！")
         print(f"输出文件: {output_file_clean}")
@@ -3,12 +3,21 @@
 # 支持二元自动扩展、退化信源特殊处理、详细输出
 
 import argparse
-import csv
 import numpy as np
 import sys
 import os
+import struct
 import time
 from dahuffman_no_EOF import HuffmanCodec
+from _popcnt import POPCNT8
+
+try:
+    from numba import njit
+except ImportError:  # 未安装numba时使用NumPy实现
+    njit = None
+
+# NumPy编码时每块处理的符号数，临时数组大小只与块大小和码长有关
+ENCODE_CHUNK_SIZE = 1 << 16
 
 
 class CustomParser(argparse.ArgumentParser):
@@ -26,8 +35,8 @@ def setup_cli():
     return parser.parse_args()
 
 
-def get_256_prob_file(original_pmf_path):
-    """如果原PMF是二元，生成或读取对应的256元PMF文件（路径与byteSource一致）"""
+def get_256_prob_file(original_pmf_path, pmf=None):
+    """如果原PMF是二元，生成或读取对应的256元PMF文件（路径与byteSource一致）；pmf为已读入的(符号, 概率)行"""
     temp_dir = os.path.join("..", "data", "temp", "file_2bit_to_256bit")
     if not os.path.exists(temp_dir):
         os.makedirs(temp_dir)
@@ -40,64 +49,140 @@ def get_256_prob_file(original_pmf_path):
         return prob_256_path
 
     # 生成256元概率
+    if pmf is None:
+        pmf = np.loadtxt(original_pmf_path, delimiter=',', ndmin=2)
     prob_2bit = np.zeros(2)
-    with open(original_pmf_path, newline='', encoding='utf-8') as f:
-        for row in csv.reader(f):
-            if row:
-                prob_2bit[int(row[0])] = float(row[1])
-
-    with open(prob_256_path, "w", newline='') as f:
-        for i in range(256):
-            count_1 = bin(i).count('1')
-            count_0 = 8 - count_1
-            p = (prob_2bit[0] ** count_0) * (prob_2bit[1] ** count_1)
-            if p == 0:
-                p = 0.0  # 避免写科学计数法
-            f.write(f"{i},{p:.8f}\n")
+    prob_2bit[pmf[:, 0].astype(int)] = pmf[:, 1]
+
+    # 先写临时文件再原子替换，并行运行的其他场景不会读到写了一半的文件
+    # 每个字节值的概率为 p0^(0的个数) * p1^(1的个数)，一次算出256个值、一次写入
+    syms = np.arange(256, dtype=np.uint8)
+    count_1 = POPCNT8[syms]
+    count_0 = 8 - count_1
+    p = (prob_2bit[0] ** count_0) * (prob_2bit[1] ** count_1)
+    tmp_path = f"{prob_256_path}.{os.getpid()}.tmp"
+    np.savetxt(tmp_path, np.column_stack((syms, p)), fmt=['%d', '%.8f'], delimiter=',')
+    os.replace(tmp_path, prob_256_path)
 
     return prob_256_path
 
 
-def main():
-    args = setup_cli()
-    verbose = args.verbose
-
+if njit is not None:
+    @njit(cache=True)
+    def _pack_codes_numba(data, lengths, codes, out):
+        # 64位移位寄存器逐符号拼接码字，满8位输出一个字节（码长不超过56位）
+        buffer = np.uint64(0)
+        size = 0
+        n = 0
+        for i in range(data.size):
+            s = data[i]
+            buffer = (buffer << np.uint64(lengths[s])) | codes[s]
+            size += lengths[s]
+            while size >= 8:
+                size -= 8
+                out[n] = (buffer >> np.uint64(size)) & np.uint64(0xFF)
+                n += 1
+            buffer &= (np.uint64(1) << np.uint64(size)) - np.uint64(1)
+        return n, buffer, size
+
+
+def _pack_codes_numpy(data, code_table, lengths):
+    """按块把每个符号展开为码字比特再打包，返回(完整字节, 末尾不足8位的比特)"""
+    # 所有码字的比特依次拼接，offsets[s]为符号s的码字在其中的起始位置
+    offsets = np.zeros(256, dtype=np.int64)
+    code_bits = []
+    pos = 0
+    for symbol, (bits, value) in code_table.items():
+        offsets[symbol] = pos
+        code_bits.append(np.array([(value >> (bits - 1 - k)) & 1 for k in range(bits)], dtype=np.uint8))
+        pos += bits
+    code_bits = np.concatenate(code_bits) if pos else np.zeros(0, dtype=np.uint8)
+
+    packed = []
+    carry = np.zeros(0, dtype=np.uint8)  # 上一块末尾不足8位的比特
+    for start in range(0, len(data), ENCODE_CHUNK_SIZE):
+        chunk = data[start:start + ENCODE_CHUNK_SIZE]
+        L = lengths[chunk]
+        starts = np.cumsum(L) - L
+        # 第j个输出比特 = 所属符号码字的第(j - 该符号起始位置)位
+        idx = np.repeat(offsets[chunk] - starts, L) + np.arange(int(L.sum()))
+        bits = np.concatenate((carry, code_bits[idx]))
+        full = len(bits) // 8 * 8
+        packed.append(np.packbits(bits[:full]))
+        carry = bits[full:]
+    return b''.join(p.tobytes() for p in packed), carry
+
+
+def huffman_encode(code_table, data):
+    """
+    按码表对uint8数组进行Huffman编码，结果与 HuffmanCodec(code_table).encode(data.tobytes()) 相同：
+    码表先展开为按字节值索引的数组，不再逐符号查字典；最后不足一个字节时用EOF符号（码表中的第一个符号）的码字补齐
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    known = np.zeros(256, dtype=bool)
+    lengths = np.zeros(256, dtype=np.int64)
+    codes = np.zeros(256, dtype=np.uint64)
+    for symbol, (bits, value) in code_table.items():
+        known[symbol] = True
+        lengths[symbol] = bits
+        codes[symbol] = value if bits <= 56 else 0
+    unknown = ~known[data]
+    if unknown.any():
+        raise KeyError(int(data[np.argmax(unknown)]))
+
+    if njit is not None and lengths.max() <= 56:
+        out = np.empty(-(-int(lengths[data].sum()) // 8), dtype=np.uint8)
+        n, buffer, size = _pack_codes_numba(data, lengths, codes, out)
+        payload = out[:n].tobytes()
+        buffer, size = int(buffer), int(size)
+    else:
+        payload, carry = _pack_codes_numpy(data, code_table, lengths)
+        size = len(carry)
+        buffer = int(''.join(map(str, carry)), 2) if size else 0
+
+    # 与dahuffman相同的结尾处理：用EOF符号的码字补齐最后一个字节
+    if size > 0:
+        eof = next(iter(code_table))
+        bits, value = code_table[eof]
+        buffer = (buffer << bits) + value
+        size += bits
+        byte = buffer >> (size - 8) if size >= 8 else buffer << (8 - size)
+        payload += bytes([byte])
+    return payload
+
+
+def main(pmf_file, input_file, output_file, verbose=False):
+    """
+    对input_file进行Huffman编码并写入output_file，可在其他模块中直接调用
+    返回值：0表示成功，1表示失败
+    """
     start_time = time.time()
 
-    # 判断是二元还是256元
-    with open(args.PMF) as f:
-        num_lines = sum(1 for _ in f if _.strip())
+    # 读取PMF（每行：符号,概率，空行自动跳过），按行数判断是二元还是256元
+    pmf = np.loadtxt(pmf_file, delimiter=',', ndmin=2)
 
-    if num_lines == 2:
-        prob_file = get_256_prob_file(args.PMF)
+    if pmf.shape[0] == 2:
+        prob_file = get_256_prob_file(pmf_file, pmf)
         if verbose:
             print(f"Detected 2-symbol source → using 256-symbol PMF: {prob_file}")
-    else:
-        prob_file = args.PMF
-
-    # 读取256元频率
-    frequencies = {}
-    with open(prob_file, newline='', encoding='utf-8') as f:
-        for row in csv.reader(f):
-            if row:
-                symbol = int(row[0])
-                prob = float(row[1])
-                if prob > 0:
-                    frequencies[symbol] = prob
+        pmf = np.loadtxt(prob_file, delimiter=',', ndmin=2)
+
+    # 256元频率，按文件中的顺序只保留正概率符号
+    frequencies = {int(symbol): float(prob) for symbol, prob in pmf if prob > 0}
 
     if not frequencies:
         print("Error: No valid symbols with positive probability")
-        sys.exit(1)
+        return 1
 
     # 创建编码器
     codec = HuffmanCodec.from_frequencies(frequencies)
 
     # 读取消息
-    data = np.fromfile(args.INPUT, dtype=np.uint8)
+    data = np.fromfile(input_file, dtype=np.uint8)
     original_len = len(data)
     if original_len == 0:
         print("Error: Input file is empty")
-        sys.exit(1)
+        return 1
 
     # 获取码表
     code_table = codec.get_code_table()
@@ -113,28 +198,27 @@ def main():
 
     # 编码（退化情况也正常编码）
     try:
-        encoded_payload = codec.encode(data.tobytes())
+        encoded_payload = huffman_encode(code_table, data)
     except Exception as e:
         print("Encoding failed:", e)
-        sys.exit(1)
-
-    # 构建头部
-    header = bytearray()
-    header.append(len(code_table) - 1)
-    header.extend(original_len.to_bytes(4, 'little'))
-
-    for symbol in sorted(code_table.keys()):
-        bits, value = code_table[symbol]
+        return 1
+
+    # 构建头部：2字节头部长度 + 1字节符号数-1 + 4字节原始长度 + 每个符号的(符号, 码长, 码字)
+    # 按符号值从小到大写入码表；符号都是0~255的字节值，直接按值遍历，不需要排序
+    entries = [(symbol,) + tuple(code_table[symbol]) for symbol in range(256) if symbol in code_table]
+    header_size = 7 + sum(2 + (bits + 7) // 8 for _, bits, _ in entries)
+    # 按最终大小一次分配，各字段直接写入对应位置
+    full_header = bytearray(header_size)
+    struct.pack_into('<HBI', full_header, 0, header_size, len(code_table) - 1, original_len)
+    off = 7
+    for symbol, bits, value in entries:
         bytes_needed = (bits + 7) // 8
-        header.append(symbol)
-        header.append(bits)
-        header.extend(value.to_bytes(bytes_needed, 'little'))
-
-    header_size = len(header) + 2
-    full_header = header_size.to_bytes(2, 'little') + header
+        struct.pack_into('<BB', full_header, off, symbol, bits)
+        full_header[off + 2:off + 2 + bytes_needed] = value.to_bytes(bytes_needed, 'little')
+        off += 2 + bytes_needed
 
     # 写入压缩文件
-    with open(args.OUTPUT, 'wb') as f:
+    with open(output_file, 'wb') as f:
         f.write(full_header)
         f.write(encoded_payload)
 
@@ -147,10 +231,13 @@ def main():
 
         print(f"[{end_time - start_time:.3f} sec] Encoding completed")
         print(f"    Original: {original_len} bytes")
-        print(f"    Compressed: {len(full_header) + len(encoded_payload)} bytes → {args.OUTPUT}")
+        print(f"    Compressed: {len(full_header) + len(encoded_payload)} bytes → {output_file}")
         print(f"    Avg code length: {avg_len:.4f} bits/symbol")
         print(f"    Entropy: {entropy:.4f} bits/symbol")
 
+    return 0
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = setup_cli()
+    sys.exit(main(args.PMF, args.INPUT, args.OUTPUT, args.verbose))
\ No newline at end of file
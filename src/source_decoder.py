@@ -3,6 +3,7 @@
 # 兼容 list/bytes 返回、退化信源
 
 import argparse
+import mmap
 import numpy as np
 import sys
 import os
@@ -24,27 +25,61 @@ def setup_cli():
     return parser.parse_args()
 
 
-def main():
-    args = setup_cli()
-    verbose = args.verbose
-
-    start_time = time.time()
-
-    if not os.path.exists(args.INPUT):
-        print(f"Error: {args.INPUT} not found")
-        sys.exit(1)
+def write_output(data, output_file):
+    """把uint8数组的内存直接写入output_file，每次os.write最多1MiB，不经过Python文件对象的缓冲"""
+    buf = memoryview(np.ascontiguousarray(data)).cast('B')
+    fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        pos = 0
+        while pos < len(buf):
+            pos += os.write(fd, buf[pos:pos + (1 << 20)])
+    finally:
+        os.close(fd)
 
-    with open(args.INPUT, 'rb') as f:
-        data = f.read()
 
-    if len(data) < 6:
-        print("Error: File too short")
-        sys.exit(1)
+def main(input_file, output_file, verbose=False):
+    """
+    对input_file进行Huffman解码并写入output_file，可在其他模块中直接调用
+    返回值：0表示成功，1表示失败
+    """
+    start_time = time.time()
 
-    # 解析头部
+    try:
+        f = open(input_file, 'rb')
+    except FileNotFoundError:
+        print(f"Error: {input_file} not found")
+        return 1
+
+    with f:
+        if os.fstat(f.fileno()).st_size < 6:
+            print("Error: File too short")
+            return 1
+        # 以只读内存映射的方式访问文件，头部和码流都是内存视图，不复制文件内容
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # 解码结束（包括头部损坏导致解析出错）后立即释放视图、关闭映射，Windows下映射未关闭时文件保持锁定
+    data = memoryview(mapped)
+    try:
+        return decode_data(data, output_file, verbose, start_time)
+    finally:
+        data.release()
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # 出错时回溯仍引用码流视图，由引用释放时自动解除映射
+
+
+def decode_data(data, output_file, verbose=False, start_time=None):
+    """
+    对.huf文件的内容data（bytes或内存视图）进行Huffman解码并写入output_file
+    返回值：0表示成功
+    """
+    if start_time is None:
+        start_time = time.time()
+
+    # 解析头部；头部只有几百字节，复制为bytes，解析出错时不会留下引用映射的视图
     header_size = int.from_bytes(data[:2], 'little')
-    header = data[2:header_size]
-    payload = data[header_size:]
+    header = bytes(data[2:header_size])
 
     pos = 0
     symbol_count = header[pos] + 1
@@ -63,36 +98,33 @@ def main():
         code_table[symbol] = (bits, value)
         pos += bytes_needed
 
-    # 特殊处理：如果码表只有一个符号且码长为0或1
-    if len(code_table) == 1:
-        symbol, (bits, value) = next(iter(code_table.items()))
-        if bits <= 1:  # 包括0或1的情况
-            # 直接填充该符号
-            recovered = np.full(original_len, symbol, dtype=np.uint8)
-            if verbose:
-                print("Degenerate source detected → direct fill with unique symbol")
-        else:
-            codec = HuffmanCodec(code_table)
-            decoded = codec.decode(payload)
-            decoded_bytes = bytes(decoded[:original_len]) if isinstance(decoded, list) else decoded[:original_len]
-            recovered = np.frombuffer(decoded_bytes, dtype=np.uint8)
+    # 特殊处理：如果码表只有一个符号且码长为0或1（包括0或1的情况），直接填充该符号，
+    # 不读取码流，也不构造解码器
+    symbol, (bits, value) = next(iter(code_table.items()))
+    if len(code_table) == 1 and bits <= 1:
+        recovered = np.full(original_len, symbol, dtype=np.uint8)
+        if verbose:
+            print("Degenerate source detected → direct fill with unique symbol")
     else:
         # 正常解码
         codec = HuffmanCodec(code_table)
-        decoded = codec.decode(payload)
+        decoded = codec.decode(data[header_size:])
         decoded_bytes = bytes(decoded[:original_len]) if isinstance(decoded, list) else decoded[:original_len]
         recovered = np.frombuffer(decoded_bytes, dtype=np.uint8)
 
     # 写入恢复文件
-    recovered.tofile(args.OUTPUT)
+    write_output(recovered, output_file)
 
     end_time = time.time()
 
     if verbose:
         print(f"[{end_time - start_time:.3f} sec] Decoding completed")
         print(f"    Expected: {original_len} bytes")
-        print(f"    Recovered: {len(recovered)} bytes → {args.OUTPUT}")
+        print(f"    Recovered: {len(recovered)} bytes → {output_file}")
         print(f"    {'Perfect recovery!' if len(recovered) == original_len else 'Length mismatch!'}")
 
+    return 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = setup_cli()
+    sys.exit(main(args.INPUT, args.OUTPUT, args.verbose))
\ No newline at end of file